@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+import aqp_pipeline
+import aqp_quantize
+
+# Multi-frame sources (animated GIF/WebP, multi-page TIFF, ICO) to BMP4/BMP1 frame
+# sequences. All frames share one palette, optimized once from the merged RGB444
+# histogram of every scaled frame; the frames themselves convert in parallel.
+BANK_EXTENSION = ".bank"
+
+
+def frame_count(img):
+    return getattr(img, "n_frames", 1)
+
+
+def load_frames(file_path):
+    # Every frame as a full RGB image (Pillow composites GIF frames while seeking)
+    with Image.open(file_path) as img:
+        return [frame.convert("RGB") for frame in ImageSequence.Iterator(img)]
+
+
+def scale_frames(frames, export_fmt="BMP4", scaling="stretch", sampling="bicubic"):
+    size = aqp_pipeline.target_size(export_fmt)
+    return [aqp_pipeline.scale_image(frame, size, scaling, sampling) for frame in frames]
+
+
+def shared_palette(scaled_frames, colors=16):
+    # One palette for the whole animation from the summed frame histograms
+    hist = np.zeros(4096, dtype=np.int64)
+    for frame in scaled_frames:
+        hist += aqp_quantize.rgb444_histogram(np.asarray(frame))
+    return aqp_quantize.optimize_palette(hist, colors)
+
+
+def convert_frame(task):
+    # Worker entry point: one already scaled frame -> encoded file bytes
+    frame, palette, options = task
+    img, palette = aqp_pipeline.process_image(
+        frame,
+        export_fmt=options["export_fmt"],
+        scaling="stretch",  # frames arrive at the target size
+        dither=options["dither"],
+        palette=palette,
+        cells=options["cells"],
+        metric=options["metric"],
+    )
+    return aqp_pipeline.encode_image(img, palette, options["export_fmt"])
+
+
+def convert_frames(frames, options, palette=None, jobs=1):
+    # Returns (list of encoded frames, shared palette). options as for aqp_cli
+    # convert: export_fmt (BMP4/BMP1), scaling, sampling, dither, cells, metric.
+    scaled = scale_frames(frames, options["export_fmt"], options["scaling"], options["sampling"])
+    if palette is None:
+        palette = shared_palette(scaled)
+    tasks = [(frame, palette, options) for frame in scaled]
+    if jobs <= 1 or len(tasks) <= 1:
+        return [convert_frame(task) for task in tasks], palette
+    jobs = min(jobs, len(tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        encoded = list(pool.map(convert_frame, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+    return encoded, palette
+
+
+def frame_paths(out_dir, name, export_fmt, count):
+    # name_000.bmp4, name_001.bmp4, ...
+    digits = max(3, len(str(count - 1)))
+    ext = aqp_pipeline.FILE_EXTENSIONS[export_fmt]
+    return [os.path.join(out_dir, f"{name}_{i:0{digits}d}{ext}") for i in range(count)]
+
+
+def write_frames(encoded, out_dir, name, export_fmt):
+    paths = frame_paths(out_dir, name, export_fmt, len(encoded))
+    for path, data in zip(paths, encoded):
+        with open(path, "wb") as f:
+            f.write(data)
+    return paths
+
+
+def write_bank(encoded, file_path):
+    # Frame bank: the complete BMP4/BMP1 files back to back, so frame i starts
+    # at i * BMP4_FILE_BYTES (or BMP1_FILE_BYTES) and loads like a single image
+    with open(file_path, "wb") as f:
+        for data in encoded:
+            f.write(data)
+    return file_path
@@ -0,0 +1,162 @@
+import numpy as np
+
+import aqp_cells
+import aqp_pipeline
+import aqp_text
+from aqp_palette import indices_to_image
+from aqp_text import DEFAULT_PALETTE, TEXT_ROWS
+
+# Bloxel painting for text screens: every 8x8 character is split into 2 columns
+# of 4-pixel-wide blocks and 2, 3 or 4 rows, and drawn with a semigraphic glyph
+# in one fg/bg pair. Blocks are numbered row by row, left column first, and a
+# pattern has bit i set where block i shows fg.
+BLOXEL_MODES = ["2x2", "2x3", "2x4"]
+# Pixel rows covered by each block row (AQUASCII's 2x3 set splits 3/2/3)
+BLOXEL_ROWS = {"2x2": (4, 4), "2x3": (3, 2, 3), "2x4": (2, 2, 2, 2)}
+SPACE_CHAR = 0x20
+
+
+def grid_size(mode, columns=40):
+    # Bloxels across and down a whole screen
+    aqp_text.screen_size(columns)
+    return columns * 2, TEXT_ROWS * len(BLOXEL_ROWS[mode])
+
+
+def pattern_masks(mode):
+    # (patterns, 8, 8) bool: every block pattern of a mode drawn as glyph pixels
+    rows = BLOXEL_ROWS[mode]
+    blocks = 2 * len(rows)
+    bits = (np.arange(1 << blocks)[:, None] >> np.arange(blocks)) & 1
+    block_of_pixel = np.repeat(np.arange(len(rows)), rows)[:, None] * 2 + np.repeat([0, 1], 4)[None, :]
+    return bits[:, block_of_pixel].astype(bool)
+
+
+def pattern_index(glyphs, mode):
+    # Pattern -> (char, swap fg/bg) lookup tables, built once per charset and mode.
+    # Each pattern takes the glyph, or inverted glyph, with the fewest wrong pixels,
+    # so patterns the charset draws exactly are exact and the rest come close.
+    masks = pattern_masks(mode).reshape(-1, 64).astype(np.int32)
+    bits = np.asarray(glyphs).reshape(len(glyphs), 64).astype(np.int32)
+    wrong = masks @ (1 - bits).T + (1 - masks) @ bits.T  # (patterns, glyphs)
+    plain = np.argmin(wrong, axis=1)
+    inverted = np.argmin(64 - wrong, axis=1)
+    rows = np.arange(len(masks))
+    swap = 64 - wrong[rows, inverted] < wrong[rows, plain]
+    chars = np.where(swap, inverted, plain).astype(np.uint8)
+    return chars, swap
+
+
+def cell_blocks(grid, mode):
+    # (rows, columns, blocks) view of a bloxel grid, one row of blocks per character
+    block_rows = len(BLOXEL_ROWS[mode])
+    h, w = grid.shape[:2]
+    arr = grid.reshape((h // block_rows, block_rows, w // 2, 2) + grid.shape[2:]).swapaxes(1, 2)
+    return arr.reshape((h // block_rows, w // 2, block_rows * 2) + grid.shape[2:])
+
+
+def encode_cells(err, index):
+    # err is (cells, blocks, n) block-vs-palette error. Picks the least-error
+    # fg/bg pair per cell, thresholds the blocks to a pattern and looks up its
+    # glyph. Returns (chars, fg, bg).
+    pattern_chars, pattern_swap = index
+    rows = np.arange(len(err))
+    a, b = aqp_cells.best_pairs(err)
+    use_a = err[rows, :, a] <= err[rows, :, b]
+    pattern = (use_a.astype(np.int64) << np.arange(err.shape[1])).sum(axis=1)
+    pattern[a == b] = 0  # Flat cells are a space in the bg color
+    swap = pattern_swap[pattern]
+    fg = np.where(swap, b, a).astype(np.uint8)
+    bg = np.where(swap, a, b).astype(np.uint8)
+    return pattern_chars[pattern], fg, bg
+
+
+def image_to_bloxels(img, glyphs, mode="2x3", palette=DEFAULT_PALETTE, columns=40, scaling="stretch", sampling="bicubic", metric="rgb"):
+    # Downsample to the bloxel grid, then match every cell at once.
+    # Returns (chars, fg, bg), each (25, columns).
+    size = grid_size(mode, columns)
+    grid = np.asarray(aqp_pipeline.scale_image(img.convert("RGB"), size, scaling, sampling))
+    blocks = cell_blocks(grid, mode)
+    err = aqp_text.pixel_errors(blocks.reshape(-1, blocks.shape[2], 3), palette, metric)
+    chars, fg, bg = encode_cells(err, pattern_index(glyphs, mode))
+    shape = (TEXT_ROWS, columns)
+    return chars.reshape(shape), fg.reshape(shape), bg.reshape(shape)
+
+
+class BloxelScreen:
+    # Editable bloxel screen: a grid of palette indices plus the encoded text
+    # screen. Painting only marks characters dirty; encode() re-matches just
+    # those, so a brush stroke costs a few cells, not the whole screen.
+    def __init__(self, glyphs, mode="2x3", columns=40, palette=DEFAULT_PALETTE):
+        self.glyphs = glyphs
+        self.mode = mode
+        self.columns = columns
+        self.palette = list(palette)
+        self.index = pattern_index(glyphs, mode)
+        w, h = grid_size(mode, columns)
+        self.grid = np.zeros((h, w), dtype=np.uint8)
+        self.chars = np.full((TEXT_ROWS, columns), SPACE_CHAR, dtype=np.uint8)
+        self.fg = np.zeros((TEXT_ROWS, columns), dtype=np.uint8)
+        self.bg = np.zeros((TEXT_ROWS, columns), dtype=np.uint8)
+        self.dirty = np.ones((TEXT_ROWS, columns), dtype=bool)
+        # Error between palette colors, so off-pair blocks fall to the nearer of fg/bg
+        self._color_errors = aqp_text.pixel_errors(np.asarray(self.palette).reshape(1, -1, 3), self.palette)[0]
+
+    @property
+    def size(self):
+        return self.grid.shape[1], self.grid.shape[0]
+
+    def paint(self, x, y, color):
+        # Set one bloxel; returns False when it was already that color
+        if not (0 <= x < self.grid.shape[1] and 0 <= y < self.grid.shape[0]) or self.grid[y, x] == color:
+            return False
+        self.grid[y, x] = color
+        self.dirty[y // len(BLOXEL_ROWS[self.mode]), x // 2] = True
+        return True
+
+    def clear(self, color=0):
+        self.grid[:] = color
+        self.dirty[:] = True
+
+    def encode(self):
+        # Re-match the dirty cells; returns how many were updated
+        rows, cols = np.nonzero(self.dirty)
+        if len(rows):
+            blocks = cell_blocks(self.grid, self.mode)[rows, cols]
+            chars, fg, bg = encode_cells(self._color_errors[blocks], self.index)
+            self.chars[rows, cols] = chars
+            self.fg[rows, cols] = fg
+            self.bg[rows, cols] = bg
+            self.dirty[rows, cols] = False
+        return len(rows)
+
+    def load_image(self, img, scaling="stretch", sampling="bicubic", metric="rgb"):
+        self.chars, self.fg, self.bg = image_to_bloxels(img, self.glyphs, self.mode, self.palette, self.columns, scaling, sampling, metric)
+        self._grid_from_screen()
+
+    def load_scr(self, data):
+        # Characters that aren't bloxels are kept until a block in them is painted
+        chars, fg, bg = aqp_text.unpack_scr(data, self.columns)
+        self.chars, self.fg, self.bg = chars.copy(), fg.copy(), bg.copy()
+        self._grid_from_screen()
+
+    def _grid_from_screen(self):
+        # Blocks take the color at their center pixel, as rendered
+        self.dirty[:] = False
+        indices = self.render_indices()
+        rows = BLOXEL_ROWS[self.mode]
+        ys = np.concatenate([[0], np.cumsum(rows)[:-1]]) + np.array(rows) // 2
+        ys = (np.arange(TEXT_ROWS)[:, None] * 8 + ys).reshape(-1)
+        xs = np.arange(self.columns * 2) * 4 + 2
+        self.grid = np.ascontiguousarray(indices[ys[:, None], xs])
+
+    def render_indices(self):
+        self.encode()
+        return aqp_text.render_indices(self.chars, self.fg, self.bg, self.glyphs)
+
+    def render(self):
+        # P-mode image of the screen (320x200 or 640x200)
+        return indices_to_image(self.render_indices(), self.palette)
+
+    def to_scr(self):
+        self.encode()
+        return aqp_text.pack_scr(self.chars, self.fg, self.bg)
@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+# Least-recently-used cache for preview pipeline stages, bounded by memory use.
+# Values are shared between callers and must be treated as read-only.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def image_key(img):
+    # Content hash of an image, including its palette for P-mode images
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.mode}:{img.size}".encode())
+    if img.mode == "P":
+        h.update(bytes(img.getpalette() or []))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+def value_size(value):
+    # Rough memory footprint in bytes of a cached stage result
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(value_size(v) for v in value) + 8 * len(value)
+    return 64
+
+
+class StageCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = value_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes_used -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes_used += size
+            while self.bytes_used > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.bytes_used -= old_size
+
+    def get_or_compute(self, key, compute):
+        # compute runs outside the lock; an exception leaves nothing cached
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
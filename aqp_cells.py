@@ -0,0 +1,97 @@
+import numpy as np
+
+import aqp_color
+from aqp_formats import BMP1_SIZE, CELL_COLS, CELL_ROWS, cell_view
+
+# BMP1 cell color selection: every 8x8 cell can only show two palette colors
+CELL_MODES = ["common", "optimal", "dither"]
+
+
+def cell_errors(rgb, palette, metric="rgb"):
+    # Squared RGB error of every pixel against every palette color: (1000, 64, 16).
+    # Perceptual metrics gather float32 distances from the cached RGB444 table instead.
+    cells = cell_view(np.asarray(rgb, dtype=np.int32)).reshape(CELL_ROWS * CELL_COLS, 64, 3)
+    if metric != "rgb":
+        return aqp_color.distance_table(palette, metric)[aqp_color.rgb444_index(cells)]
+    pal = np.asarray(palette, dtype=np.int32).reshape(-1, 3)
+    # |c - p|^2 expanded so the cross term is a single matmul
+    err = (cells * cells).sum(axis=2)[:, :, None] - 2 * (cells @ pal.T) + (pal * pal).sum(axis=1)
+    return err.astype(np.int32)
+
+
+def best_pairs(err):
+    # Exhaustive search over all palette pairs (and single colors) for each cell.
+    # err is (cells, 64, n); returns the two column indices with the lowest summed error.
+    n_cells, _, n = err.shape
+    err = np.ascontiguousarray(err.transpose(0, 2, 1))
+    worst = np.inf if err.dtype.kind == "f" else np.iinfo(err.dtype).max
+    cost = np.full((n_cells, n, n), worst, dtype=err.dtype)
+    for a in range(n):
+        cost[:, a, a:] = np.minimum(err[:, a:a+1, :], err[:, a:, :]).sum(axis=2, dtype=err.dtype)
+    best = np.argmin(cost.reshape(n_cells, n * n), axis=1)
+    return best // n, best % n
+
+
+def optimal_cell_colors(rgb, palette, metric="rgb"):
+    # Pick each cell's fg/bg pair to minimize summed color error, then re-threshold
+    # every pixel to the nearer of the two. Returns (indices, fg, bg).
+    err = cell_errors(rgb, palette, metric)
+    rows = np.arange(len(err))
+    a, b = best_pairs(err)
+    use_a = err[rows, :, a] <= err[rows, :, b]
+    return _cells_to_indices(use_a, a, b)
+
+
+def _cells_to_indices(use_a, a, b):
+    # The color covering more of the cell is the foreground
+    swap = use_a.sum(axis=1) < 32
+    fg = np.where(swap, b, a)
+    bg = np.where(swap, a, b)
+    cells = np.where(use_a, a[:, None], b[:, None]).reshape(CELL_ROWS, CELL_COLS, 8, 8)
+    w, h = BMP1_SIZE
+    indices = np.ascontiguousarray(cells.swapaxes(1, 2)).reshape(h, w).astype(np.uint8)
+    return indices, fg.astype(np.uint8).reshape(CELL_ROWS, CELL_COLS), bg.astype(np.uint8).reshape(CELL_ROWS, CELL_COLS)
+
+
+def dither_cells(rgb, palette, metric="rgb"):
+    # Floyd-Steinberg that respects the BMP1 limit: each cell's pair is chosen
+    # first, then every pixel picks between only those two colors while the
+    # error spreads within and across cells. Returns (indices, fg, bg).
+    rgb = np.asarray(rgb)
+    a, b = best_pairs(cell_errors(rgb, palette, metric))
+    table = None if metric == "rgb" else aqp_color.distance_table(palette, metric)
+    pal = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+    pair_a = pal[a].reshape(CELL_ROWS, CELL_COLS, 3)
+    pair_b = pal[b].reshape(CELL_ROWS, CELL_COLS, 3)
+    w, h = BMP1_SIZE
+    work = rgb.astype(np.float32)
+    use_a = np.zeros((h, w), dtype=bool)
+    # One pixel column of every cell in the row is handled per step
+    for y in range(h):
+        row = y // 8
+        below = y + 1 < h
+        for c in range(8):
+            xs = np.arange(CELL_COLS) * 8 + c
+            val = np.clip(work[y, xs], 0, 255)
+            if table is None:
+                pick_a = ((val - pair_a[row]) ** 2).sum(axis=1) <= ((val - pair_b[row]) ** 2).sum(axis=1)
+            else:
+                dist = table[aqp_color.rgb444_index(val)]
+                cols = np.arange(CELL_COLS) + row * CELL_COLS
+                pick_a = dist[np.arange(CELL_COLS), a[cols]] <= dist[np.arange(CELL_COLS), b[cols]]
+            use_a[y, xs] = pick_a
+            err = val - np.where(pick_a[:, None], pair_a[row], pair_b[row])
+            down = 5 / 16
+            if c < 7:
+                work[y, xs + 1] += err * (7 / 16)
+            else:
+                # The next cell's pixel on this line is already done, push that share down
+                down += 7 / 16
+            if below:
+                work[y + 1, xs] += err * down
+                left = xs - 1
+                work[y + 1, left[left >= 0]] += err[left >= 0] * (3 / 16)
+                right = xs + 1
+                work[y + 1, right[right < w]] += err[right < w] * (1 / 16)
+    use_a = cell_view(use_a).reshape(CELL_ROWS * CELL_COLS, 64)
+    return _cells_to_indices(use_a, a, b)
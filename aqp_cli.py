@@ -0,0 +1,497 @@
+import argparse
+import glob
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import aqp_anim
+import aqp_bloxel
+import aqp_compress
+import aqp_framebank
+import aqp_pack
+import aqp_pipeline
+import aqp_quantize
+import aqp_text
+import aqp_tiles
+import aqp_vram
+from aqp_palette import read_jasc_palette, write_jasc_palette
+
+# Headless command line for AQP Studio (no Tk required)
+# Usage: python aqp_cli.py convert images/*.png -o build/ -f BMP4
+#        python aqp_cli.py anim title.gif -o build/ --bank
+#        python aqp_cli.py anim title.gif -o build/ --delta --keyframes 16
+#        python aqp_cli.py palette scan.jpg -o scan.pal
+#        python aqp_cli.py pack assets/ -o assets.aqpk
+#        python aqp_cli.py text title.png -o title.scr --columns 80
+#        python aqp_cli.py text title.png -o title.scr --bloxels 2x3
+#        python aqp_cli.py render title.scr -o title.png --charset janky.chr
+#        python aqp_cli.py tiles level.png -o build/
+#        python aqp_cli.py vram --tilemap level.png --sprites hero.png --threshold 24
+
+
+def find_inputs(patterns, recursive=False):
+    # Expand files, directories and glob patterns into a sorted, de-duplicated list
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                paths = [os.path.join(d, name) for d, _, names in os.walk(pattern) for name in names]
+            else:
+                paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+            paths = [p for p in paths if os.path.splitext(p)[1].lower() in aqp_pipeline.IMAGE_EXTENSIONS]
+        elif glob.has_magic(pattern):
+            paths = [p for p in glob.glob(pattern, recursive=recursive) if os.path.isfile(p)]
+        else:
+            paths = [pattern]
+        found.extend(sorted(paths))
+    inputs = []
+    seen = set()
+    for path in found:
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            inputs.append(path)
+    return inputs
+
+
+def output_path(in_path, out_dir, export_fmt, compress=None):
+    name = os.path.splitext(os.path.basename(in_path))[0] + aqp_pipeline.FILE_EXTENSIONS[export_fmt]
+    if compress:
+        name += aqp_compress.EXTENSIONS[compress]
+    return os.path.join(out_dir or os.path.dirname(in_path), name)
+
+
+def convert_file(in_path, out_path, options):
+    # Photos load as the same proxy the GUI previews and exports from
+    img, source_palette = aqp_pipeline.load_image(in_path, aqp_pipeline.PROXY_SIZE)
+    palette = options["palette"]
+    if palette is None and options["source_palette"]:
+        palette = source_palette
+    img, palette = aqp_pipeline.process_image(
+        img,
+        export_fmt=options["export_fmt"],
+        scaling=options["scaling"],
+        sampling=options["sampling"],
+        dither=options["dither"],
+        palette=palette,
+        cells=options["cells"],
+        metric=options["metric"],
+        quantizer=options["quantizer"],
+    )
+    method = options.get("compress")
+    if not method:
+        aqp_pipeline.save_image(img, palette, options["export_fmt"], out_path)
+        return None
+    # Compressed variant: the whole BMP4/BMP1 file as an RLE or LZ stream
+    raw = aqp_pipeline.encode_image(img, palette, options["export_fmt"])
+    packed = aqp_compress.compress(raw, method)
+    if aqp_compress.decompress(packed, method) != raw:
+        raise ValueError(f"{method} stream failed to round trip")
+    with open(out_path, "wb") as f:
+        f.write(packed)
+    return aqp_compress.compression_report(raw, packed, method)
+
+
+def convert_task(task):
+    # Worker entry point: never raises, so one bad image can't stop the batch
+    in_path, out_path, options = task
+    try:
+        note = convert_file(in_path, out_path, options)
+        return in_path, out_path, None, note
+    except Exception as e:
+        return in_path, out_path, f"{e}\n\n{traceback.format_exc()}", None
+
+
+def run_tasks(tasks, jobs=1):
+    # Yields (in_path, out_path, error, note) in input order.
+    # Images are CPU bound in numpy/Pillow and hold the GIL, so use processes.
+    if jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield convert_task(task)
+        return
+    jobs = min(jobs, len(tasks))
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(convert_task, tasks, chunksize=chunksize)
+
+
+def cmd_convert(args):
+    inputs = find_inputs(args.inputs, args.recursive)
+    if not inputs:
+        print("No input images found.", file=sys.stderr)
+        return 1
+    options = {
+        "export_fmt": args.format,
+        "scaling": args.scaling,
+        "sampling": args.sampling,
+        "dither": args.dither,
+        "cells": args.cells,
+        "metric": args.metric,
+        "quantizer": args.quantizer,
+        "compress": args.compress,
+        "palette": read_jasc_palette(args.palette) if args.palette else None,
+        "source_palette": args.source_palette,
+    }
+    if args.compress and args.format == "PNG":
+        print("--compress needs BMP4 or BMP1 output.", file=sys.stderr)
+        return 1
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    tasks = []
+    planned = set()
+    for in_path in inputs:
+        out_path = output_path(in_path, args.output, args.format, args.compress)
+        key = os.path.normcase(os.path.abspath(out_path))
+        if key in planned:
+            print(f"skip {in_path} (another input already writes {out_path})")
+            continue
+        if os.path.exists(out_path) and not args.overwrite:
+            print(f"skip {out_path} (exists, use --overwrite)")
+            continue
+        planned.add(key)
+        tasks.append((in_path, out_path, options))
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    failures = []
+    for in_path, out_path, error, note in run_tasks(tasks, jobs):
+        if error:
+            failures.append((in_path, error))
+            print(f"FAILED {in_path}: {error.splitlines()[0]}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"{in_path} -> {out_path}" + (f"  [{note}]" if note else ""))
+    if failures:
+        with open(args.error_log, "w") as f:
+            for in_path, error in failures:
+                f.write(f"Failed to convert {in_path}: {error}\n")
+        print(f"{len(failures)} of {len(tasks)} images failed, see {args.error_log} for details.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_palette(args):
+    # Optimized 16-color RGB444 palette of one image, from a streaming histogram
+    palette = aqp_quantize.palette_from_file(args.input)
+    out_path = args.output or os.path.splitext(args.input)[0] + ".pal"
+    if os.path.exists(out_path) and not args.overwrite:
+        print(f"{out_path} exists, use --overwrite", file=sys.stderr)
+        return 1
+    write_jasc_palette(out_path, palette)
+    print(f"{args.input} -> {out_path}")
+    return 0
+
+
+def cmd_anim(args):
+    # One animation -> numbered frame files or a single frame bank, sharing one palette
+    options = {
+        "export_fmt": args.format,
+        "scaling": args.scaling,
+        "sampling": args.sampling,
+        "dither": args.dither,
+        "cells": args.cells,
+        "metric": args.metric,
+    }
+    palette = read_jasc_palette(args.palette) if args.palette else None
+    frames = aqp_anim.load_frames(args.input)
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    out_dir = args.output or os.path.dirname(args.input)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if args.delta:
+        targets = [os.path.join(out_dir, name + aqp_framebank.BANK_EXTENSION)]
+    elif args.bank:
+        targets = [os.path.join(out_dir, name + aqp_anim.BANK_EXTENSION)]
+    else:
+        targets = aqp_anim.frame_paths(out_dir, name, args.format, len(frames))
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing and not args.overwrite:
+        print(f"{existing[0]} exists, use --overwrite", file=sys.stderr)
+        return 1
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    encoded, palette = aqp_anim.convert_frames(frames, options, palette, jobs)
+    if args.delta:
+        data = aqp_framebank.encode_bank(encoded, args.format, args.keyframes)
+        # Round trip before writing, so a bank on disk always decodes to the frames
+        if not aqp_framebank.verify_bank(data, encoded):
+            print(f"{args.input}: frame bank failed to round trip", file=sys.stderr)
+            return 1
+        with open(targets[0], "wb") as f:
+            f.write(data)
+        if not args.quiet:
+            raw = sum(len(frame) for frame in encoded)
+            print(f"{targets[0]}: {len(data)} bytes, {raw / len(data):.1f}x smaller than {len(encoded)} full frames")
+    elif args.bank:
+        aqp_anim.write_bank(encoded, targets[0])
+    else:
+        aqp_anim.write_frames(encoded, out_dir, name, args.format)
+    if args.save_palette:
+        write_jasc_palette(args.save_palette, palette)
+    if not args.quiet:
+        print(f"{args.input}: {len(frames)} frames -> {targets[0] if args.bank or args.delta else out_dir or '.'}")
+    return 0
+
+
+def cmd_pack(args):
+    out_path = args.output or os.path.normpath(args.directory) + aqp_pack.PACK_EXTENSION
+    if os.path.exists(out_path) and not args.overwrite:
+        print(f"{out_path} exists, use --overwrite", file=sys.stderr)
+        return 1
+    count = aqp_pack.pack_directory(args.directory, out_path, not args.no_recursive, args.all)
+    print(f"{count} files -> {out_path} ({os.path.getsize(out_path)} bytes)")
+    return 0
+
+
+def cmd_list(args):
+    with aqp_pack.AssetPack(args.pack) as pack:
+        for entry in pack.entries.values():
+            print(f"{aqp_pack.TYPE_NAMES.get(entry.type, '?'):6} {entry.length:8} {entry.name}")
+        print(f"{len(pack)} entries")
+    return 0
+
+
+def cmd_unpack(args):
+    with aqp_pack.AssetPack(args.pack) as pack:
+        paths = pack.extract(args.output)
+    print(f"{len(paths)} files -> {args.output}")
+    return 0
+
+
+def cmd_text(args):
+    # Image -> SCR text screen, every cell matched to a glyph and color pair
+    out_path = args.output or os.path.splitext(args.input)[0] + aqp_text.SCR_EXTENSIONS[0]
+    if os.path.exists(out_path) and not args.overwrite:
+        print(f"{out_path} exists, use --overwrite", file=sys.stderr)
+        return 1
+    glyphs = aqp_text.load_charset(args.charset)
+    palette = read_jasc_palette(args.palette) if args.palette else aqp_text.DEFAULT_PALETTE
+    img, _ = aqp_pipeline.load_image(args.input)
+    if args.bloxels:
+        cells = aqp_bloxel.image_to_bloxels(img, glyphs, args.bloxels, palette, args.columns, args.scaling, args.sampling, args.metric)
+        data = aqp_text.pack_scr(*cells)
+    else:
+        img = aqp_pipeline.scale_image(img.convert("RGB"), aqp_text.screen_size(args.columns), args.scaling, args.sampling)
+        data = aqp_text.image_to_scr(img, glyphs, palette, args.columns, args.metric)
+    with open(out_path, "wb") as f:
+        f.write(data)
+    print(f"{args.input} -> {out_path} ({args.columns} columns)")
+    return 0
+
+
+def cmd_render(args):
+    # SCR text screen -> PNG preview with any charset and palette
+    out_path = args.output or os.path.splitext(args.input)[0] + ".png"
+    if os.path.exists(out_path) and not args.overwrite:
+        print(f"{out_path} exists, use --overwrite", file=sys.stderr)
+        return 1
+    palette = read_jasc_palette(args.palette) if args.palette else aqp_text.DEFAULT_PALETTE
+    with open(args.input, "rb") as f:
+        data = f.read()
+    img = aqp_text.render_scr(data, aqp_text.load_charset(args.charset), palette, args.columns)
+    img.save(out_path, format="PNG")
+    print(f"{args.input} -> {out_path} ({img.width}x{img.height})")
+    return 0
+
+
+def cmd_tiles(args):
+    # Image -> deduplicated 4bpp tileset, 64x32 tilemap and palette.
+    # BMP4/BMP1 inputs are used as they are; other images go through the pipeline.
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    out_dir = args.output or os.path.dirname(args.input)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    targets = [os.path.join(out_dir, name + ext) for ext in (aqp_tiles.TILESET_EXTENSION, aqp_tiles.TILEMAP_EXTENSION, ".pal")]
+    existing = [path for path in targets if os.path.exists(path)]
+    if existing and not args.overwrite:
+        print(f"{existing[0]} exists, use --overwrite", file=sys.stderr)
+        return 1
+    img, palette = aqp_pipeline.load_image(args.input)
+    ext = os.path.splitext(args.input)[1].lower()
+    if ext not in aqp_pipeline.BMP4_EXTENSIONS and ext not in aqp_pipeline.BMP1_EXTENSIONS:
+        forced = read_jasc_palette(args.palette) if args.palette else None
+        img, palette = aqp_pipeline.process_image(img, export_fmt="PNG", scaling=args.scaling, sampling=args.sampling,
+                                                  dither=args.dither, palette=forced, metric=args.metric)
+    indices = aqp_tiles.image_indices(img, double_width=ext in aqp_pipeline.BMP4_EXTENSIONS)
+    tileset, numbers, flags = aqp_tiles.build_tiles(indices, flips=not args.no_flips)
+    print(f"{args.input}: {aqp_tiles.tiles_report(tileset, numbers, flags)}")
+    if len(tileset) > aqp_tiles.MAX_TILES:
+        print(f"{args.input}: too many unique tiles for one tilemap", file=sys.stderr)
+        return 1
+    aqp_tiles.write_tiles(out_dir, name, tileset, numbers, flags, args.palette_bank, args.priority)
+    write_jasc_palette(targets[2], palette)
+    print(f"{args.input} -> {', '.join(targets)}")
+    return 0
+
+
+def frame_size(text):
+    # "16x16" -> (16, 16), for argparse
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text}")
+    return w, h
+
+
+def indexed_image(in_path, palette, dither, metric, sprites=False):
+    # Palette indices and palette of an image at its own size. BMP4/BMP1 are used
+    # as they are (BMP4 widened to 320 pixels), anything else is quantized; sprite
+    # sheets keep index 0 for their transparent pixels.
+    img, source_palette = aqp_pipeline.load_image(in_path)
+    ext = os.path.splitext(in_path)[1].lower()
+    if ext in aqp_pipeline.BMP4_EXTENSIONS or ext in aqp_pipeline.BMP1_EXTENSIONS:
+        return aqp_tiles.image_indices(img, double_width=ext in aqp_pipeline.BMP4_EXTENSIONS), source_palette
+    if sprites:
+        return aqp_vram.sprite_indices(img, palette, dither, metric)
+    img, palette = aqp_pipeline.quantize_image(img.convert("RGB"), dither, palette, metric=metric)
+    return aqp_tiles.image_indices(img), palette
+
+
+def cmd_vram(args):
+    # Plan tilemap images and sprite sheets into VRAM and report each region
+    if not args.tilemap and not args.sprites:
+        print("Give at least one --tilemap or --sprites image.", file=sys.stderr)
+        return 1
+    if len(args.tilemap) > 1:
+        print("VRAM holds one tilemap, give --tilemap once.", file=sys.stderr)
+        return 1
+    if args.output and os.path.exists(args.output) and not args.overwrite:
+        print(f"{args.output} exists, use --overwrite", file=sys.stderr)
+        return 1
+    palette = read_jasc_palette(args.palette) if args.palette else None
+    assets = []
+    for in_path in args.tilemap:
+        indices, pal = indexed_image(in_path, palette, args.dither, args.metric)
+        assets.append(aqp_vram.tilemap_asset(os.path.basename(in_path), indices, pal))
+    for in_path in args.sprites:
+        indices, pal = indexed_image(in_path, palette, args.dither, args.metric, sprites=True)
+        assets.append(aqp_vram.sprite_asset(os.path.basename(in_path), indices, pal, args.sprite_size, args.instances))
+    for asset in assets:
+        slots = f", {asset.slots} sprite slots" if asset.kind == "sprites" else ""
+        print(f"{asset.name}: {asset.kind}, {len(asset.tiles)} unique tiles{slots}")
+    plan = aqp_vram.plan_vram(assets, args.threshold, args.budget)
+    print(aqp_vram.plan_report(plan))
+    if not aqp_vram.plan_fits(plan):
+        return 1
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(aqp_vram.vram_image(plan))
+        print(f"-> {args.output}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aqp-studio", description="AQP Studio command line tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Convert images to BMP4, BMP1 or PNG")
+    convert.add_argument("inputs", nargs="+", help="Image files, directories or glob patterns")
+    convert.add_argument("-o", "--output", help="Output directory (default: next to each input)")
+    convert.add_argument("-f", "--format", choices=aqp_pipeline.EXPORT_FORMATS, default="BMP4", type=str.upper)
+    convert.add_argument("--scaling", choices=aqp_pipeline.SCALING_MODES, default="stretch")
+    convert.add_argument("--sampling", choices=aqp_pipeline.SAMPLING_METHODS, default="bicubic")
+    convert.add_argument("--dither", choices=aqp_pipeline.DITHER_MODES, default="floyd")
+    convert.add_argument("--cells", choices=aqp_pipeline.CELL_MODES, default="common", help="BMP1 cell colors: most common pair, least-error pair, or least-error pair with cell-aware dithering")
+    convert.add_argument("--metric", choices=aqp_pipeline.COLOR_METRICS, default="rgb", help="Color distance used to match pixels to the palette")
+    convert.add_argument("--quantizer", choices=aqp_pipeline.QUANTIZERS, default="median", help="Palette generation: Pillow median cut, or k-means optimized in the 12-bit RGB444 space")
+    convert.add_argument("--palette", help="JASC-PAL file to force onto every image")
+    convert.add_argument("--source-palette", action="store_true", help="Force the palette stored in BMP4/BMP1 inputs")
+    convert.add_argument("--compress", choices=aqp_compress.METHODS, help="Write an RLE or LZ compressed file (.rle/.lz appended) and report ratio and decode cost")
+    convert.add_argument("-r", "--recursive", action="store_true", help="Recurse into directories and ** globs")
+    convert.add_argument("--overwrite", action="store_true", help="Replace existing output files")
+    convert.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (0 = one per CPU core)")
+    convert.add_argument("--error-log", default="error_log.txt", help="Where to write per-file failure details")
+    convert.add_argument("-q", "--quiet", action="store_true")
+    convert.set_defaults(func=cmd_convert)
+    anim = sub.add_parser("anim", help="Convert every frame of an animated GIF/WebP/TIFF with one shared palette")
+    anim.add_argument("input", help="Multi-frame image file")
+    anim.add_argument("-o", "--output", help="Output directory (default: next to the input)")
+    anim.add_argument("-f", "--format", choices=["BMP4", "BMP1"], default="BMP4", type=str.upper)
+    anim.add_argument("--scaling", choices=aqp_pipeline.SCALING_MODES, default="stretch")
+    anim.add_argument("--sampling", choices=aqp_pipeline.SAMPLING_METHODS, default="bicubic")
+    anim.add_argument("--dither", choices=aqp_pipeline.DITHER_MODES, default="floyd")
+    anim.add_argument("--cells", choices=aqp_pipeline.CELL_MODES, default="common")
+    anim.add_argument("--metric", choices=aqp_pipeline.COLOR_METRICS, default="rgb")
+    anim.add_argument("--palette", help="JASC-PAL file to use instead of the optimized shared palette")
+    anim.add_argument("--save-palette", help="Also write the shared palette to this JASC-PAL file")
+    layout = anim.add_mutually_exclusive_group()
+    layout.add_argument("--bank", action="store_true", help="Write one .bank file with all frames back to back")
+    layout.add_argument("--delta", action="store_true", help="Write one .aqfb frame bank: a keyframe plus changed byte spans per frame")
+    anim.add_argument("--keyframes", type=int, default=0, help="With --delta, store every n-th frame whole (0 = first frame only)")
+    anim.add_argument("--overwrite", action="store_true", help="Replace existing output files")
+    anim.add_argument("-j", "--jobs", type=int, default=0, help="Worker processes (0 = one per CPU core)")
+    anim.add_argument("-q", "--quiet", action="store_true")
+    anim.set_defaults(func=cmd_anim)
+    pack = sub.add_parser("pack", help="Pack a directory of BMP4/BMP1/PAL files into one indexed asset pack")
+    pack.add_argument("directory", help="Directory to pack")
+    pack.add_argument("-o", "--output", help="Pack file to write (default: <directory>.aqpk)")
+    pack.add_argument("--all", action="store_true", help="Include every file, not only BMP4/BMP1/PAL")
+    pack.add_argument("--no-recursive", action="store_true", help="Only pack the top-level directory")
+    pack.add_argument("--overwrite", action="store_true", help="Replace an existing pack")
+    pack.set_defaults(func=cmd_pack)
+    list_cmd = sub.add_parser("list", help="List the entries of an asset pack")
+    list_cmd.add_argument("pack", help="Asset pack file")
+    list_cmd.set_defaults(func=cmd_list)
+    unpack = sub.add_parser("unpack", help="Extract every file from an asset pack")
+    unpack.add_argument("pack", help="Asset pack file")
+    unpack.add_argument("-o", "--output", default=".", help="Directory to extract into")
+    unpack.set_defaults(func=cmd_unpack)
+    palette = sub.add_parser("palette", help="Extract an optimized 16-color palette from an image of any size. "
+                             "Large JPEGs are read at reduced scale and uncompressed BMP/TGA/TIFF/PPM in strips; "
+                             "PNG, WebP and compressed TIFF are decoded in full")
+    palette.add_argument("input", help="Image file")
+    palette.add_argument("-o", "--output", help="JASC-PAL file to write (default: next to the input)")
+    palette.add_argument("--overwrite", action="store_true", help="Replace an existing palette file")
+    palette.set_defaults(func=cmd_palette)
+    text = sub.add_parser("text", help="Convert an image to a 40 or 80 column SCR text screen")
+    text.add_argument("input", help="Image file")
+    text.add_argument("-o", "--output", help="SCR file to write (default: next to the input)")
+    text.add_argument("--columns", type=int, choices=aqp_text.TEXT_COLUMNS, default=40)
+    text.add_argument("--charset", default=aqp_text.DEFAULT_CHARSET, help="2048-byte charset (default: AQUASCII)")
+    text.add_argument("--palette", help="JASC-PAL file to use instead of the default Aquarius+ palette")
+    text.add_argument("--scaling", choices=aqp_pipeline.SCALING_MODES, default="stretch")
+    text.add_argument("--sampling", choices=aqp_pipeline.SAMPLING_METHODS, default="bicubic")
+    text.add_argument("--metric", choices=aqp_pipeline.COLOR_METRICS, default="rgb", help="Color distance used to match cells to glyphs")
+    text.add_argument("--bloxels", choices=aqp_bloxel.BLOXEL_MODES, help="Use only semigraphic block glyphs, downsampled to this many blocks per character")
+    text.add_argument("--overwrite", action="store_true", help="Replace an existing SCR file")
+    text.set_defaults(func=cmd_text)
+    render = sub.add_parser("render", help="Render an SCR text screen to a PNG")
+    render.add_argument("input", help="SCR file")
+    render.add_argument("-o", "--output", help="PNG file to write (default: next to the input)")
+    render.add_argument("--columns", type=int, choices=aqp_text.TEXT_COLUMNS, help="Screen width (default: from the file size)")
+    render.add_argument("--charset", default=aqp_text.DEFAULT_CHARSET, help="2048-byte charset, e.g. a .chr file (default: AQUASCII)")
+    render.add_argument("--palette", help="JASC-PAL file to use instead of the default Aquarius+ palette")
+    render.add_argument("--overwrite", action="store_true", help="Replace an existing PNG")
+    render.set_defaults(func=cmd_render)
+    tiles = sub.add_parser("tiles", help="Cut an image into deduplicated 8x8 tiles and a tilemap")
+    tiles.add_argument("input", help="Image file (BMP4/BMP1 are used without re-quantizing)")
+    tiles.add_argument("-o", "--output", help="Output directory (default: next to the input)")
+    tiles.add_argument("--scaling", choices=aqp_pipeline.SCALING_MODES, default="stretch")
+    tiles.add_argument("--sampling", choices=aqp_pipeline.SAMPLING_METHODS, default="bicubic")
+    tiles.add_argument("--dither", choices=aqp_pipeline.DITHER_MODES, default="none", help="Dithering makes fewer tiles repeat, so it is off by default")
+    tiles.add_argument("--metric", choices=aqp_pipeline.COLOR_METRICS, default="rgb")
+    tiles.add_argument("--palette", help="JASC-PAL file to force onto the image")
+    tiles.add_argument("--no-flips", action="store_true", help="Only merge identical tiles, not flipped copies")
+    tiles.add_argument("--palette-bank", type=int, choices=range(4), default=0, help="Palette number stored in every tilemap entry")
+    tiles.add_argument("--priority", action="store_true", help="Set the priority bit in every tilemap entry")
+    tiles.add_argument("--overwrite", action="store_true", help="Replace existing output files")
+    tiles.set_defaults(func=cmd_tiles)
+    vram = sub.add_parser("vram", help="Check whether tilemap images and sprite sheets fit in VRAM together")
+    vram.add_argument("--tilemap", action="append", default=[], help="Tilemap image, up to 512x256 (VRAM holds one 64x32 tilemap)")
+    vram.add_argument("--sprites", action="append", default=[], help="Sprite sheet image (repeatable); fully transparent pixels, or index 0 in BMP4/BMP1, are transparent")
+    vram.add_argument("--sprite-size", type=frame_size, default=(16, 16), help="Sprite frame size in pixels, multiples of 8 (default: 16x16)")
+    vram.add_argument("--instances", type=int, default=1, help="Copies of each sprite on screen at once")
+    vram.add_argument("--threshold", type=float, default=0.0, help="Merge tiles within this RMS RGB error per pixel when over budget (0 = exact only)")
+    vram.add_argument("--budget", type=int, help="Tile patterns to aim for (default: all free patterns)")
+    vram.add_argument("--palette", help="JASC-PAL file to force onto every image, so all share one palette bank")
+    vram.add_argument("--dither", choices=aqp_pipeline.DITHER_MODES, default="none")
+    vram.add_argument("--metric", choices=aqp_pipeline.COLOR_METRICS, default="rgb")
+    vram.add_argument("-o", "--output", help="Write the 16 KB VRAM image (tilemap plus patterns) when it fits")
+    vram.add_argument("--overwrite", action="store_true", help="Replace an existing VRAM image")
+    vram.set_defaults(func=cmd_vram)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
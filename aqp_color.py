@@ -0,0 +1,146 @@
+from functools import lru_cache
+
+import numpy as np
+
+# Perceptual color distances for palette matching. The Aquarius+ palette is 12-bit,
+# so every metric is evaluated once per palette on the 4096 RGB444 colors and
+# pixels are then matched with a table gather.
+METRICS = ["rgb", "redmean", "cie76", "ciede2000", "oklab"]
+METRIC_LABELS = {
+    "rgb": "RGB",
+    "redmean": "Redmean",
+    "cie76": "CIE76",
+    "ciede2000": "CIEDE2000",
+    "oklab": "OKLab",
+}
+
+# Every RGB444 color expanded to 8 bits (k * 17), indexed by r << 8 | g << 4 | b
+RGB444_COLORS = np.stack(np.meshgrid(np.arange(16), np.arange(16), np.arange(16), indexing="ij"), axis=-1).reshape(-1, 3) * 17
+
+XYZ_MATRIX = np.array([[0.4124564, 0.3575761, 0.1804375],
+                       [0.2126729, 0.7151522, 0.0721750],
+                       [0.0193339, 0.1191920, 0.9503041]])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+OKLAB_LMS = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                      [0.2119034982, 0.6806995451, 0.1073969566],
+                      [0.0883024619, 0.2817188376, 0.6299787005]])
+OKLAB_LAB = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                      [1.9779984951, -2.4285922050, 0.4505937099],
+                      [0.0259040371, 0.7827717662, -0.8086757660]])
+
+
+def srgb_to_linear(rgb):
+    c = np.asarray(rgb, dtype=np.float64) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def rgb_to_lab(rgb):
+    # sRGB (0-255) -> CIELAB, D65 white point
+    xyz = srgb_to_linear(rgb) @ XYZ_MATRIX.T / D65_WHITE
+    eps = (6 / 29) ** 3
+    f = np.where(xyz > eps, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    fx, fy, fz = f[..., 0], f[..., 1], f[..., 2]
+    return np.stack([116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)], axis=-1)
+
+
+def rgb_to_oklab(rgb):
+    lms = np.cbrt(srgb_to_linear(rgb) @ OKLAB_LMS.T)
+    return lms @ OKLAB_LAB.T
+
+
+def redmean_distance(c1, c2):
+    # Weighted RGB approximation of perceived difference (squared)
+    c1 = np.asarray(c1, dtype=np.float64)
+    c2 = np.asarray(c2, dtype=np.float64)
+    rmean = (c1[..., 0] + c2[..., 0]) / 2
+    d = c1 - c2
+    return ((2 + rmean / 256) * d[..., 0] ** 2 + 4 * d[..., 1] ** 2 + (2 + (255 - rmean) / 256) * d[..., 2] ** 2)
+
+
+def ciede2000(lab1, lab2):
+    # CIEDE2000 color difference with kL = kC = kH = 1
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    c_bar = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    g = 0.5 * (1 - np.sqrt(c_bar ** 7 / (c_bar ** 7 + 25.0 ** 7)))
+    a1p, a2p = a1 * (1 + g), a2 * (1 + g)
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dl = L2 - L1
+    dc = c2p - c1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(c1p * c2p == 0, 0, dh)
+    dH = 2 * np.sqrt(c1p * c2p) * np.sin(np.radians(dh / 2))
+
+    l_bar = (L1 + L2) / 2
+    cp_bar = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    hp_bar = np.where(np.abs(h1p - h2p) > 180, np.where(h_sum < 360, h_sum + 360, h_sum - 360), h_sum) / 2
+    hp_bar = np.where(c1p * c2p == 0, h_sum, hp_bar)
+    t = (1 - 0.17 * np.cos(np.radians(hp_bar - 30)) + 0.24 * np.cos(np.radians(2 * hp_bar))
+         + 0.32 * np.cos(np.radians(3 * hp_bar + 6)) - 0.20 * np.cos(np.radians(4 * hp_bar - 63)))
+    sl = 1 + 0.015 * (l_bar - 50) ** 2 / np.sqrt(20 + (l_bar - 50) ** 2)
+    sc = 1 + 0.045 * cp_bar
+    sh = 1 + 0.015 * cp_bar * t
+    rt = (-2 * np.sqrt(cp_bar ** 7 / (cp_bar ** 7 + 25.0 ** 7))
+          * np.sin(np.radians(60 * np.exp(-(((hp_bar - 275) / 25) ** 2)))))
+    return np.sqrt((dl / sl) ** 2 + (dc / sc) ** 2 + (dH / sh) ** 2 + rt * (dc / sc) * (dH / sh))
+
+
+def color_distances(colors, palette, metric="rgb"):
+    # (n, len(palette)) squared distance (or squared delta E) of every color to every palette entry
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    pal = np.asarray(palette, dtype=np.float64).reshape(-1, 3)
+    if metric == "rgb":
+        return ((colors[:, None, :] - pal[None, :, :]) ** 2).sum(axis=2)
+    if metric == "redmean":
+        return redmean_distance(colors[:, None, :], pal[None, :, :])
+    if metric == "cie76":
+        return ((rgb_to_lab(colors)[:, None, :] - rgb_to_lab(pal)[None, :, :]) ** 2).sum(axis=2)
+    if metric == "ciede2000":
+        return ciede2000(rgb_to_lab(colors)[:, None, :], rgb_to_lab(pal)[None, :, :]) ** 2
+    if metric == "oklab":
+        return ((rgb_to_oklab(colors)[:, None, :] - rgb_to_oklab(pal)[None, :, :]) ** 2).sum(axis=2)
+    raise ValueError(f"Unknown color metric: {metric}")
+
+
+@lru_cache(maxsize=32)
+def _distance_table(palette, metric):
+    table = color_distances(RGB444_COLORS, palette, metric).astype(np.float32)
+    table.flags.writeable = False
+    return table
+
+
+@lru_cache(maxsize=32)
+def _metric_lut(palette, metric):
+    lut = np.argmin(_distance_table(palette, metric), axis=1).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def _palette_key(palette):
+    return tuple(tuple(int(v) for v in c) for c in np.asarray(palette).reshape(-1, 3))
+
+
+def distance_table(palette, metric="rgb"):
+    # Cached (4096, n) float32 distances from every RGB444 color to the palette (read-only)
+    return _distance_table(_palette_key(palette), metric)
+
+
+def metric_lut(palette, metric="rgb"):
+    # Cached 4096-entry nearest palette index for every RGB444 color (read-only)
+    return _metric_lut(_palette_key(palette), metric)
+
+
+def rgb444_index(rgb):
+    # Nearest RGB444 table index for 8-bit (or float, already clipped) colors
+    q = (np.asarray(rgb, dtype=np.float32) * (1 / 17) + 0.5).astype(np.int32)
+    return (q[..., 0] << 8) | (q[..., 1] << 4) | q[..., 2]
+
+
+def lut_indices(rgb, palette, metric="rgb"):
+    # Palette index for every pixel, via the RGB444 table
+    return metric_lut(palette, metric)[rgb444_index(rgb)]
@@ -0,0 +1,190 @@
+import struct
+
+# Compressed variants of BMP4/BMP1 files for faster loading from SD card. Both
+# streams start with the decoded size (u16, little endian) and are simple enough
+# for a short Z80 routine: every token is a literal run or a repeat, and each
+# copy is a single LDIR.
+#
+#   rle  control byte c < 0x80: c + 1 literal bytes follow (1..128)
+#        c >= 0x80: the next byte repeats c - 0x7E times (2..129)
+#   lz   token t < 0x80: t literal bytes follow (1..127)
+#        t >= 0x80: copy (t & 0x7F) + 3 bytes (3..130) from offset bytes back,
+#        offset is a u16 that follows; overlapping copies are allowed, as LDIR
+#        copies one byte at a time
+METHODS = ["rle", "lz"]
+EXTENSIONS = {"rle": ".rle", "lz": ".lz"}
+RLE_MAX_LITERAL = 128
+RLE_MAX_RUN = 129
+LZ_MAX_LITERAL = 127
+LZ_MIN_MATCH = 3
+LZ_MAX_MATCH = 130
+LZ_MAX_CHAIN = 32
+# Rough Z80 T-states: LDIR moves a byte in 21, each token costs about this much
+# to fetch, decode and set up. A plain LDIR of the raw file is the baseline.
+LDIR_T_STATES = 21
+RLE_TOKEN_T_STATES = 60
+LZ_LITERAL_T_STATES = 60
+LZ_MATCH_T_STATES = 100
+
+
+def method_for_path(file_path):
+    # "rle" or "lz" from a .rle/.lz file name, None for uncompressed files
+    ext = file_path[file_path.rfind("."):].lower() if "." in file_path else ""
+    for method, method_ext in EXTENSIONS.items():
+        if ext == method_ext:
+            return method
+    return None
+
+
+def compress(data, method):
+    if method == "rle":
+        return rle_compress(data)
+    if method == "lz":
+        return lz_compress(data)
+    raise ValueError(f"Unknown compression method: {method}")
+
+
+def decompress(data, method):
+    if method == "rle":
+        return rle_decompress(data)
+    if method == "lz":
+        return lz_decompress(data)
+    raise ValueError(f"Unknown compression method: {method}")
+
+
+def rle_compress(data):
+    data = bytes(data)
+    n = len(data)
+    out = bytearray(struct.pack("<H", n))
+    literal_start = pos = 0
+
+    def flush(end):
+        for start in range(literal_start, end, RLE_MAX_LITERAL):
+            chunk = data[start:min(start + RLE_MAX_LITERAL, end)]
+            out.append(len(chunk) - 1)
+            out.extend(chunk)
+
+    while pos < n:
+        run = 1
+        while pos + run < n and run < RLE_MAX_RUN and data[pos + run] == data[pos]:
+            run += 1
+        if run >= 2:
+            flush(pos)
+            out += bytes([0x7E + run, data[pos]])
+            pos += run
+            literal_start = pos
+        else:
+            pos += 1
+    flush(n)
+    return bytes(out)
+
+
+def rle_decompress(data):
+    (size,) = struct.unpack_from("<H", data, 0)
+    out = bytearray()
+    pos = 2
+    while len(out) < size:
+        c = data[pos]
+        if c < 0x80:
+            out += data[pos + 1:pos + 2 + c]
+            pos += 2 + c
+        else:
+            out += bytes([data[pos + 1]]) * (c - 0x7E)
+            pos += 2
+    return bytes(out)
+
+
+def lz_compress(data):
+    # Greedy LZ77 with hash chains on 3-byte prefixes; the window is the whole file
+    data = bytes(data)
+    n = len(data)
+    out = bytearray(struct.pack("<H", n))
+    chains = {}
+    literals = bytearray()
+
+    def flush():
+        for start in range(0, len(literals), LZ_MAX_LITERAL):
+            chunk = literals[start:start + LZ_MAX_LITERAL]
+            out.append(len(chunk))
+            out.extend(chunk)
+        literals.clear()
+
+    def insert(p):
+        chains.setdefault(data[p:p + LZ_MIN_MATCH], []).append(p)
+
+    pos = 0
+    while pos < n:
+        best_len = best_pos = 0
+        if pos + LZ_MIN_MATCH <= n:
+            limit = min(LZ_MAX_MATCH, n - pos)
+            for cand in reversed(chains.get(data[pos:pos + LZ_MIN_MATCH], [])[-LZ_MAX_CHAIN:]):
+                length = LZ_MIN_MATCH
+                while length < limit and data[cand + length] == data[pos + length]:
+                    length += 1
+                if length > best_len:
+                    best_len, best_pos = length, cand
+                    if length == limit:
+                        break
+        if best_len >= LZ_MIN_MATCH and pos - best_pos <= 0xFFFF:
+            flush()
+            out.append(0x80 | (best_len - LZ_MIN_MATCH))
+            out += struct.pack("<H", pos - best_pos)
+            for p in range(pos, min(pos + best_len, n - LZ_MIN_MATCH + 1)):
+                insert(p)
+            pos += best_len
+        else:
+            literals.append(data[pos])
+            if pos + LZ_MIN_MATCH <= n:
+                insert(pos)
+            pos += 1
+    flush()
+    return bytes(out)
+
+
+def lz_decompress(data):
+    (size,) = struct.unpack_from("<H", data, 0)
+    out = bytearray()
+    pos = 2
+    while len(out) < size:
+        t = data[pos]
+        if t < 0x80:
+            out += data[pos + 1:pos + 1 + t]
+            pos += 1 + t
+        else:
+            (offset,) = struct.unpack_from("<H", data, pos + 1)
+            start = len(out) - offset
+            for i in range((t & 0x7F) + LZ_MIN_MATCH):
+                out.append(out[start + i])
+            pos += 3
+    return bytes(out)
+
+
+def decode_cycles(data, method):
+    # Estimated Z80 T-states to decompress a stream (token walk, no decoding)
+    (size,) = struct.unpack_from("<H", data, 0)
+    done = cycles = 0
+    pos = 2
+    while done < size:
+        c = data[pos]
+        if method == "rle":
+            length = c + 1 if c < 0x80 else c - 0x7E
+            cycles += RLE_TOKEN_T_STATES
+            pos += 2 + c if c < 0x80 else 2
+        elif c < 0x80:
+            length = c
+            cycles += LZ_LITERAL_T_STATES
+            pos += 1 + c
+        else:
+            length = (c & 0x7F) + LZ_MIN_MATCH
+            cycles += LZ_MATCH_T_STATES
+            pos += 3
+        cycles += length * LDIR_T_STATES
+        done += length
+    return cycles
+
+
+def compression_report(raw, packed, method):
+    # One line summary: sizes, ratio and decode time estimate against a raw LDIR copy
+    cycles = decode_cycles(packed, method)
+    return (f"{method}: {len(raw)} -> {len(packed)} bytes ({len(raw) / len(packed):.2f}x), "
+            f"~{cycles} T-states to decode vs {len(raw) * LDIR_T_STATES} raw")
@@ -0,0 +1,178 @@
+import numpy as np
+
+import aqp_color
+from aqp_palette import match_indices
+
+# Dithering against any fixed palette. Every method returns a (h, w) uint8 index array.
+# metric is one of aqp_color.METRICS and decides which palette color is nearest.
+# Error diffusion kernels: (divisor, [(dx, dy, weight), ...]) relative to the current pixel
+KERNELS = {
+    "floyd": (16, [(1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)]),
+    "atkinson": (8, [(1, 0, 1), (2, 0, 1), (-1, 1, 1), (0, 1, 1), (1, 1, 1), (0, 2, 1)]),
+    "jjn": (48, [(1, 0, 7), (2, 0, 5),
+                 (-2, 1, 3), (-1, 1, 5), (0, 1, 7), (1, 1, 5), (2, 1, 3),
+                 (-2, 2, 1), (-1, 2, 3), (0, 2, 5), (1, 2, 3), (2, 2, 1)]),
+    "stucki": (42, [(1, 0, 8), (2, 0, 4),
+                    (-2, 1, 2), (-1, 1, 4), (0, 1, 8), (1, 1, 4), (2, 1, 2),
+                    (-2, 2, 1), (-1, 2, 2), (0, 2, 4), (1, 2, 2), (2, 2, 1)]),
+}
+BAYER_SIZES = {"bayer2": 2, "bayer4": 4, "bayer8": 8}
+# Methods too slow for the live preview, with the method previewed in their place;
+# exports still run the real one
+EXPORT_ONLY_METHODS = {"floyd-serpentine": "floyd"}
+DITHER_METHODS = ["floyd", "floyd-serpentine", "atkinson", "jjn", "stucki", "bayer2", "bayer4", "bayer8", "none"]
+DITHER_LABELS = {
+    "floyd": "Floyd-Steinberg",
+    "floyd-serpentine": "Serpentine F-S (export)",
+    "atkinson": "Atkinson",
+    "jjn": "Jarvis-Judice-Ninke",
+    "stucki": "Stucki",
+    "bayer2": "Bayer 2x2",
+    "bayer4": "Bayer 4x4",
+    "bayer8": "Bayer 8x8",
+    "none": "None",
+}
+
+
+def dither(rgb, palette, method="floyd", metric="rgb"):
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    if method in BAYER_SIZES:
+        return ordered_dither(rgb, palette, BAYER_SIZES[method], metric)
+    if method == "floyd-serpentine":
+        return serpentine_floyd(rgb, palette, metric)
+    if method in KERNELS:
+        return error_diffuse(rgb, palette, KERNELS[method], metric)
+    return match_indices(rgb, palette, metric)
+
+
+def bayer_matrix(size):
+    # Normalized threshold map in [0, 1)
+    m = np.zeros((1, 1), dtype=np.int64)
+    while m.shape[0] < size:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return m / m.size
+
+
+def palette_spread(palette):
+    # Typical distance between neighbouring palette colors, used as the ordered dither amplitude
+    pal = np.unique(np.asarray(palette, dtype=np.float64).reshape(-1, 3), axis=0)
+    if len(pal) < 2:
+        return 0.0
+    dist = np.sqrt(((pal[:, None, :] - pal[None, :, :]) ** 2).sum(axis=2))
+    np.fill_diagonal(dist, np.inf)
+    return float(np.median(dist.min(axis=1)))
+
+
+def ordered_dither(rgb, palette, size, metric="rgb"):
+    h, w, _ = rgb.shape
+    threshold = np.tile(bayer_matrix(size), (h // size + 1, w // size + 1))[:h, :w] - 0.5
+    offset = threshold[:, :, None] * palette_spread(palette)
+    return match_indices(np.clip(rgb + offset, 0, 255).round().astype(np.uint8), palette, metric)
+
+
+def error_diffuse(rgb, palette, kernel, metric="rgb"):
+    # Raster-order error diffusion processed as a wavefront: pixel (x, y) is handled
+    # at step x + k*y, where k is just large enough that every pixel feeding it has
+    # already been handled. Each step is one vectorized update of all its pixels.
+    divisor, taps = kernel
+    h, w, _ = rgb.shape
+    k = int(max(-dx / dy for dx, dy, _ in taps if dy > 0)) + 1
+    pad = max(abs(dx) for dx, _, _ in taps)
+    depth = max(dy for _, dy, _ in taps)
+    work = np.zeros((h + depth, w + 2 * pad, 3), dtype=np.float32)
+    work[:h, pad:pad + w] = rgb
+    pal = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+    out = np.zeros((h, w), dtype=np.uint8)
+    taps = [(dx, dy, weight / divisor) for dx, dy, weight in taps]
+    lut = None if metric == "rgb" else aqp_color.metric_lut(palette, metric)
+    ys_all = np.arange(h)
+    for t in range(w + k * (h - 1)):
+        ys = ys_all[(t - k * ys_all >= 0) & (t - k * ys_all < w)]
+        xs = t - k * ys + pad
+        val = np.clip(work[ys, xs], 0, 255)
+        if lut is None:
+            idx = np.argmin(((val[:, None, :] - pal[None, :, :]) ** 2).sum(axis=2), axis=1)
+        else:
+            idx = lut[aqp_color.rgb444_index(val)]
+        out[ys, xs - pad] = idx
+        err = val - pal[idx]
+        for dx, dy, weight in taps:
+            work[ys + dy, xs + dx] += err * weight
+    return out
+
+
+def candidate_lut(palette, bits=6):
+    # Exact nearest-color lookup over a 2^bits per channel grid of cells. A palette
+    # color is a candidate for a cell when its distance to the cell is no more than
+    # the smallest farthest-point distance of any color, so the true nearest color
+    # of every point in the cell is among them. Returns (lut, groups): lut[cell] >= 0
+    # is the only candidate, otherwise groups[-1 - lut[cell]] lists them in order.
+    n = 1 << bits
+    step = 255 / (n - 1)
+    centers = np.arange(n) * step
+    lo = np.clip(centers - step / 2, 0, 255)[:, None]
+    hi = np.clip(centers + step / 2, 0, 255)[:, None]
+    pal = np.asarray(palette, dtype=np.float64).reshape(-1, 3)
+    near, far = [], []
+    for c in range(3):
+        p = pal[None, :, c]
+        near.append(np.maximum(np.maximum(lo - p, p - hi), 0) ** 2)
+        far.append(np.maximum(p - lo, hi - p) ** 2)
+    dmin = near[0][:, None, None] + near[1][None, :, None] + near[2][None, None, :]
+    dmax = far[0][:, None, None] + far[1][None, :, None] + far[2][None, None, :]
+    candidates = (dmin <= dmax.min(axis=3, keepdims=True)).reshape(-1, len(pal))
+    patterns, inverse = np.unique(candidates @ (1 << np.arange(len(pal), dtype=np.int64)), return_inverse=True)
+    groups = [tuple(i for i in range(len(pal)) if (int(pattern) >> i) & 1) for pattern in patterns]
+    lut = np.where(candidates.sum(axis=1) == 1, np.argmax(candidates, axis=1), -1 - inverse.reshape(-1))
+    return lut.tolist(), groups
+
+
+def serpentine_floyd(rgb, palette, metric="rgb"):
+    # Serpentine scans alternate direction per line, so no wavefront exists;
+    # this runs as a plain loop over Python floats (about 0.7 s at 320x200, hence
+    # EXPORT_ONLY_METHODS). RGB matches the exact nearest color through
+    # candidate_lut; perceptual metrics use the RGB444 table, like error_diffuse.
+    h, w, _ = rgb.shape
+    if metric == "rgb":
+        bits = 6
+        lut, groups = candidate_lut(palette, bits)
+    else:
+        bits, lut, groups = 4, aqp_color.metric_lut(palette, metric).tolist(), []
+    shift_r, shift_g = 2 * bits, bits
+    pal = [tuple(float(v) for v in c) for c in palette]
+    scale = ((1 << bits) - 1) / 255
+    work = [rgb[y].astype(np.float64).tolist() for y in range(h)] + [[[0.0, 0.0, 0.0] for _ in range(w + 2)]]
+    out = np.zeros((h, w), dtype=np.uint8)
+    for y in range(h):
+        cur, nxt = work[y], work[y + 1]
+        step = 1 if y % 2 == 0 else -1
+        row_out = [0] * w
+        for x in (range(w) if step == 1 else range(w - 1, -1, -1)):
+            px = cur[x]
+            r = min(max(px[0], 0.0), 255.0)
+            g = min(max(px[1], 0.0), 255.0)
+            b = min(max(px[2], 0.0), 255.0)
+            i = lut[(int(r * scale + 0.5) << shift_r) | (int(g * scale + 0.5) << shift_g) | int(b * scale + 0.5)]
+            if i < 0:
+                best = None
+                for j in groups[-1 - i]:
+                    pr, pg, pb = pal[j]
+                    d = (r - pr) * (r - pr) + (g - pg) * (g - pg) + (b - pb) * (b - pb)
+                    if best is None or d < best:
+                        best, i = d, j
+            row_out[x] = i
+            pr, pg, pb = pal[i]
+            er, eg, eb = r - pr, g - pg, b - pb
+            ahead, behind = x + step, x - step
+            if 0 <= ahead < w:
+                t = cur[ahead]
+                t[0] += er * 0.4375; t[1] += eg * 0.4375; t[2] += eb * 0.4375
+                t = nxt[ahead]
+                t[0] += er * 0.0625; t[1] += eg * 0.0625; t[2] += eb * 0.0625
+            if 0 <= behind < w:
+                t = nxt[behind]
+                t[0] += er * 0.1875; t[1] += eg * 0.1875; t[2] += eb * 0.1875
+            t = nxt[x]
+            t[0] += er * 0.3125; t[1] += eg * 0.3125; t[2] += eb * 0.3125
+        out[y] = row_out
+    return out
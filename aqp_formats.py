@@ -0,0 +1,132 @@
+import numpy as np
+
+# Aquarius+ BMP4 / BMP1 codecs, shared by the GUI and the headless tools.
+# Decoders take bytes (or any buffer) and return (indices, palette) where
+# indices is a uint8 array of palette indices; encoders go the other way.
+BMP4_SIZE = (160, 200)
+BMP1_SIZE = (320, 200)
+BMP4_PIXEL_BYTES = 16000
+BMP1_BITMAP_BYTES = 8000
+BMP1_CELL_BYTES = 1000
+PALETTE_BYTES = 32
+BMP4_FILE_BYTES = BMP4_PIXEL_BYTES + PALETTE_BYTES
+BMP1_FILE_BYTES = BMP1_BITMAP_BYTES + BMP1_CELL_BYTES + PALETTE_BYTES
+CELL_ROWS, CELL_COLS = 25, 40
+
+
+def decode_palette(palette_bytes):
+    # 16 colors, 2 bytes each (G4B4, R4). Each 4-bit level k is 8-bit k * 17,
+    # so 0xF is full white and encode_palette(decode_palette(b)) == b.
+    pal = np.frombuffer(palette_bytes, dtype=np.uint8, count=PALETTE_BYTES).reshape(16, 2)
+    rgb = np.stack([pal[:, 1] & 0x0F, pal[:, 0] >> 4, pal[:, 0] & 0x0F], axis=1).astype(int) * 17
+    return [tuple(int(v) for v in c) for c in rgb]
+
+
+def encode_palette(palette):
+    # Rounds every channel to the nearest 4-bit level, matching aqp_palette.snap_palette
+    rgb = ((np.asarray(palette, dtype=np.int64).reshape(-1, 3)[:16] + 8) // 17) & 0x0F
+    out = np.zeros((16, 2), dtype=np.uint8)
+    out[:len(rgb), 0] = (rgb[:, 1] << 4) | rgb[:, 2]
+    out[:len(rgb), 1] = rgb[:, 0]
+    return out.tobytes()
+
+
+def unpack_nibbles(data):
+    # Each byte holds two pixels, high nibble first
+    packed = np.frombuffer(data, dtype=np.uint8)
+    return np.stack([packed >> 4, packed & 0x0F], axis=-1).reshape(-1)
+
+
+def pack_nibbles(indices):
+    idx = np.asarray(indices, dtype=np.uint8).reshape(-1, 2)
+    return ((idx[:, 0] & 0x0F) << 4) | (idx[:, 1] & 0x0F)
+
+
+def decode_bmp4(data):
+    if len(data) < BMP4_FILE_BYTES:
+        raise ValueError("File too small to be valid BMP4/BM4")
+    w, h = BMP4_SIZE
+    indices = unpack_nibbles(data[:BMP4_PIXEL_BYTES]).reshape(h, w)
+    palette = decode_palette(data[-PALETTE_BYTES:])
+    return indices, palette
+
+
+def encode_bmp4(indices, palette):
+    # Pixel data: 160x200, each pixel is 4 bits (nybble), then the palette
+    w, h = BMP4_SIZE
+    idx = np.asarray(indices, dtype=np.uint8)
+    if idx.shape != (h, w):
+        raise ValueError(f"BMP4 image must be {w}x{h}")
+    return pack_nibbles(idx).tobytes() + encode_palette(palette)
+
+
+def unpack_bmp1(data):
+    # Returns the 1bpp bitmap as a (200, 320) array of 0/1 and the (25, 40) fg/bg cell colors
+    if len(data) < BMP1_FILE_BYTES:
+        raise ValueError("File too small to be valid BMP1/BM1")
+    w, h = BMP1_SIZE
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=BMP1_BITMAP_BYTES)).reshape(h, w)
+    cells = np.frombuffer(data, dtype=np.uint8, count=BMP1_CELL_BYTES, offset=BMP1_BITMAP_BYTES).reshape(CELL_ROWS, CELL_COLS)
+    return bits, cells >> 4, cells & 0x0F
+
+
+def decode_bmp1(data):
+    bits, fg, bg = unpack_bmp1(data)
+    palette = decode_palette(data[BMP1_BITMAP_BYTES + BMP1_CELL_BYTES:BMP1_FILE_BYTES])
+    # Broadcast each cell's fg/bg across its 8x8 block: bg ^ (bit * (fg ^ bg))
+    blocks = bits.reshape(CELL_ROWS, 8, CELL_COLS, 8)
+    indices = (blocks * (fg ^ bg)[:, None, :, None]) ^ bg[:, None, :, None]
+    indices = indices.reshape(BMP1_SIZE[1], BMP1_SIZE[0])
+    return indices, palette
+
+
+def cell_view(indices):
+    # (25, 40, 8, 8) view of a 320x200 index array, one 8x8 block per cell.
+    # Trailing axes (e.g. RGB) are kept.
+    arr = np.asarray(indices)
+    return arr.reshape((CELL_ROWS, 8, CELL_COLS, 8) + arr.shape[2:]).swapaxes(1, 2)
+
+
+def most_common_cell_colors(indices):
+    # Two most common indices per cell (ties go to the first seen), bg = fg for flat cells.
+    # Same choice as Counter(cell).most_common(2), done for all 1000 cells at once.
+    cells = cell_view(indices).reshape(CELL_ROWS * CELL_COLS, 64) & 0x0F
+    n = len(cells)
+    counts = np.bincount((np.arange(n)[:, None] * 16 + cells).ravel(), minlength=n * 16).reshape(n, 16)
+    first_seen = np.argmax(cells[:, :, None] == np.arange(16, dtype=np.uint8), axis=1)
+    score = np.where(counts > 0, counts * 64 + (63 - first_seen), -1)
+    rows = np.arange(n)
+    fg = np.argmax(score, axis=1)
+    score[rows, fg] = -1
+    bg = np.argmax(score, axis=1)
+    bg = np.where(score[rows, bg] >= 0, bg, fg)
+    return fg.astype(np.uint8).reshape(CELL_ROWS, CELL_COLS), bg.astype(np.uint8).reshape(CELL_ROWS, CELL_COLS)
+
+
+def apply_cell_colors(indices, fg, bg):
+    # What BMP1 can actually show: fg where the pixel is fg, bg everywhere else
+    w, h = BMP1_SIZE
+    fg = np.asarray(fg, dtype=np.uint8)[:, :, None, None]
+    bg = np.asarray(bg, dtype=np.uint8)[:, :, None, None]
+    blocks = np.where(cell_view(indices) == fg, fg, bg)
+    return np.ascontiguousarray(blocks.swapaxes(1, 2)).reshape(h, w)
+
+
+def pack_bmp1(indices, fg, bg):
+    # Pixels matching their cell's fg become 1 bits, everything else is bg
+    w, h = BMP1_SIZE
+    is_fg = cell_view(indices) == np.asarray(fg)[:, :, None, None]
+    bits = is_fg.swapaxes(1, 2).reshape(h, w)
+    cell_bytes = ((np.asarray(fg, dtype=np.uint8) & 0x0F) << 4) | (np.asarray(bg, dtype=np.uint8) & 0x0F)
+    return np.packbits(bits, axis=None).tobytes() + cell_bytes.tobytes()
+
+
+def encode_bmp1(indices, palette, cell_colors=None):
+    # Bitmap (8000), cell colors (1000, high nibble fg), then the palette.
+    # cell_colors is an optional (fg, bg) pair of (25, 40) arrays.
+    w, h = BMP1_SIZE
+    idx = np.asarray(indices, dtype=np.uint8)
+    if idx.shape != (h, w):
+        raise ValueError(f"BMP1 image must be {w}x{h}")
+    fg, bg = cell_colors if cell_colors is not None else most_common_cell_colors(idx)
+    return pack_bmp1(idx, fg, bg) + encode_palette(palette)
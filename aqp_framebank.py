@@ -0,0 +1,139 @@
+import struct
+
+import numpy as np
+
+from aqp_formats import BMP1_BITMAP_BYTES, BMP1_CELL_BYTES, BMP4_PIXEL_BYTES, PALETTE_BYTES
+
+# Delta-compressed frame bank for animations that share one palette.
+#
+#   header   "AQFB", version (u8), format (u8: 4 = BMP4, 1 = BMP1),
+#            frame count (u16), frame size (u16), palette (32 bytes)
+#   frames   type (u8), then
+#              FRAME_KEY:   frame size bytes of raw frame data
+#              FRAME_DELTA: span count (u16), then per span
+#                           skip (u16), length (u8), length bytes of new data
+#
+# Frame data is the file body without the palette: BMP4 pixels (16000) or
+# BMP1 bitmap + cells (9000). A span's skip counts unchanged bytes since the
+# end of the previous span, so a player keeps one write pointer, adds skip
+# and copies length bytes (an LDIR on the Z80). All integers are little endian.
+MAGIC = b"AQFB"
+VERSION = 1
+FRAME_KEY = 0
+FRAME_DELTA = 1
+FORMAT_CODES = {"BMP4": 4, "BMP1": 1}
+FRAME_BYTES = {"BMP4": BMP4_PIXEL_BYTES, "BMP1": BMP1_BITMAP_BYTES + BMP1_CELL_BYTES}
+BANK_EXTENSION = ".aqfb"
+# Unchanged gaps shorter than a span header are cheaper to copy than to skip
+SPAN_HEADER_BYTES = 3
+MAX_SPAN = 255
+
+
+def split_frame(data, export_fmt):
+    # Encoded BMP4/BMP1 file -> (frame data, palette bytes)
+    size = FRAME_BYTES[export_fmt]
+    return bytes(data[:size]), bytes(data[size:size + PALETTE_BYTES])
+
+
+def diff_spans(prev, cur, merge_gap=SPAN_HEADER_BYTES):
+    # (start, end) byte ranges where cur differs from prev, with short gaps merged
+    # and long runs split to MAX_SPAN
+    changed = np.frombuffer(prev, dtype=np.uint8) != np.frombuffer(cur, dtype=np.uint8)
+    if not changed.any():
+        return []
+    edges = np.diff(np.concatenate([[0], changed.view(np.int8), [0]]))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    gaps = starts[1:] - ends[:-1]
+    keep = np.concatenate([[True], gaps >= merge_gap])
+    starts = starts[keep]
+    ends = np.concatenate([ends[:-1][keep[1:]], ends[-1:]])
+    spans = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        for s in range(start, end, MAX_SPAN):
+            spans.append((s, min(s + MAX_SPAN, end)))
+    return spans
+
+
+def encode_delta(prev, cur):
+    spans = diff_spans(prev, cur)
+    out = bytearray(struct.pack("<BH", FRAME_DELTA, len(spans)))
+    pos = 0
+    for start, end in spans:
+        out += struct.pack("<HB", start - pos, end - start)
+        out += cur[start:end]
+        pos = end
+    return bytes(out)
+
+
+def encode_bank(frames, export_fmt="BMP4", keyframe_interval=0):
+    # frames: encoded BMP4/BMP1 files sharing one palette (as from aqp_anim.convert_frames).
+    # keyframe_interval > 0 stores every n-th frame whole so players can seek;
+    # a delta larger than the raw frame is stored as a keyframe as well.
+    if not frames:
+        raise ValueError("No frames to write")
+    size = FRAME_BYTES[export_fmt]
+    body, palette = split_frame(frames[0], export_fmt)
+    out = bytearray(MAGIC + struct.pack("<BBHH", VERSION, FORMAT_CODES[export_fmt], len(frames), size) + palette)
+    prev = None
+    for i, data in enumerate(frames):
+        cur, pal = split_frame(data, export_fmt)
+        if pal != palette:
+            raise ValueError(f"Frame {i} does not use the shared palette")
+        delta = None
+        if prev is not None and not (keyframe_interval and i % keyframe_interval == 0):
+            delta = encode_delta(prev, cur)
+        if delta is None or len(delta) > size + 1:
+            out += bytes([FRAME_KEY]) + cur
+        else:
+            out += delta
+        prev = cur
+    return bytes(out)
+
+
+def decode_bank(data):
+    # Returns (export_fmt, palette bytes, list of frame data)
+    data = memoryview(data)
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError("Not an AQFB frame bank")
+    version, code, count, size = struct.unpack_from("<BBHH", data, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame bank version {version}")
+    export_fmt = {v: k for k, v in FORMAT_CODES.items()}[code]
+    pos = 10
+    palette = bytes(data[pos:pos + PALETTE_BYTES])
+    pos += PALETTE_BYTES
+    frame = None
+    frames = []
+    for i in range(count):
+        kind = data[pos]
+        pos += 1
+        if kind == FRAME_KEY:
+            frame = bytearray(data[pos:pos + size])
+            pos += size
+        elif kind == FRAME_DELTA and frame is not None:
+            (spans,) = struct.unpack_from("<H", data, pos)
+            pos += 2
+            out = 0
+            for _ in range(spans):
+                skip, length = struct.unpack_from("<HB", data, pos)
+                pos += 3
+                out += skip
+                frame[out:out + length] = data[pos:pos + length]
+                pos += length
+                out += length
+        else:
+            raise ValueError(f"Bad frame {i} in frame bank")
+        frames.append(bytes(frame))
+    return export_fmt, palette, frames
+
+
+def bank_files(data):
+    # Decoded frames as complete BMP4/BMP1 files
+    export_fmt, palette, frames = decode_bank(data)
+    return [frame + palette for frame in frames]
+
+
+def verify_bank(data, frames):
+    # True when the bank decodes back to exactly the given encoded frames
+    files = bank_files(data)
+    return len(files) == len(frames) and all(a == bytes(b) for a, b in zip(files, frames))
@@ -0,0 +1,180 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+import aqp_formats
+import aqp_palette
+from aqp_pipeline import BMP1_EXTENSIONS, BMP4_EXTENSIONS
+
+# Indexed asset pack: many BMP4/BMP1/PAL files in one file, read through mmap.
+#
+#   header   "AQPK", version (u16), entry count (u32), data start (u32)
+#   table    per entry: type (u8), name length (u16), UTF-8 name,
+#            offset (u32, from the start of the pack), length (u32)
+#   data     the files back to back, unchanged
+#
+# Names are paths relative to the packed directory with "/" separators.
+# All integers are little endian.
+MAGIC = b"AQPK"
+VERSION = 1
+HEADER = struct.Struct("<4sHII")
+TYPE_OTHER, TYPE_BMP4, TYPE_BMP1, TYPE_PAL = 0, 1, 2, 3
+TYPE_NAMES = {TYPE_OTHER: "other", TYPE_BMP4: "bmp4", TYPE_BMP1: "bmp1", TYPE_PAL: "pal"}
+PAL_EXTENSIONS = [".pal"]
+PACK_EXTENSION = ".aqpk"
+
+PackEntry = namedtuple("PackEntry", "name type offset length")
+
+
+def entry_type(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in BMP4_EXTENSIONS:
+        return TYPE_BMP4
+    if ext in BMP1_EXTENSIONS:
+        return TYPE_BMP1
+    if ext in PAL_EXTENSIONS:
+        return TYPE_PAL
+    return TYPE_OTHER
+
+
+def find_assets(directory, recursive=True, all_files=False):
+    # Relative names of the files to pack, sorted so packs are reproducible
+    names = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(files):
+            if all_files or entry_type(file_name) != TYPE_OTHER:
+                names.append(os.path.relpath(os.path.join(root, file_name), directory).replace(os.sep, "/"))
+        if not recursive:
+            break
+    return names
+
+
+def write_pack(file_path, entries):
+    # entries: iterable of (name, data). Returns the number of entries written.
+    entries = [(name, bytes(data)) for name, data in entries]
+    table = bytearray()
+    encoded_names = [name.encode("utf-8") for name, _ in entries]
+    data_start = HEADER.size + sum(1 + 2 + len(n) + 4 + 4 for n in encoded_names)
+    offset = data_start
+    for (name, data), encoded in zip(entries, encoded_names):
+        table += struct.pack("<BH", entry_type(name), len(encoded)) + encoded + struct.pack("<II", offset, len(data))
+        offset += len(data)
+    with open(file_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), data_start))
+        f.write(table)
+        for _, data in entries:
+            f.write(data)
+    return len(entries)
+
+
+def pack_directory(directory, file_path, recursive=True, all_files=False):
+    names = find_assets(directory, recursive, all_files)
+
+    def read(name):
+        with open(os.path.join(directory, name), "rb") as f:
+            return f.read()
+    return write_pack(file_path, ((name, read(name)) for name in names))
+
+
+class AssetPack:
+    # Read-only view of a pack. data() slices are zero-copy views into the
+    # mapping; release them (or let them go) before close().
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: nothing to map
+            self._file.close()
+            raise ValueError(f"Not an asset pack: {file_path}")
+        self._view = memoryview(self._map)
+        self.entries = {}
+        try:
+            self._read_table()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_table(self):
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"Not an asset pack: {self.file_path}")
+        magic, version, count, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not an asset pack: {self.file_path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported asset pack version {version}")
+        pos = HEADER.size
+        for _ in range(count):
+            kind, name_len = struct.unpack_from("<BH", self._map, pos)
+            pos += 3
+            name = bytes(self._view[pos:pos + name_len]).decode("utf-8")
+            pos += name_len
+            offset, length = struct.unpack_from("<II", self._map, pos)
+            pos += 8
+            if offset + length > len(self._map):
+                raise ValueError(f"Asset pack entry {name} runs past the end of the file")
+            self.entries[name] = PackEntry(name, kind, offset, length)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self, kind=None):
+        return [e.name for e in self.entries.values() if kind is None or e.type == kind]
+
+    def data(self, name):
+        # Zero-copy memoryview of one entry
+        entry = self.entries[name]
+        return self._view[entry.offset:entry.offset + entry.length]
+
+    def decode(self, name):
+        # BMP4/BMP1 -> (indices, palette), PAL -> palette, anything else -> bytes
+        entry = self.entries[name]
+        view = self.data(name)
+        try:
+            if entry.type == TYPE_BMP4:
+                return aqp_formats.decode_bmp4(view)
+            if entry.type == TYPE_BMP1:
+                return aqp_formats.decode_bmp1(view)
+            if entry.type == TYPE_PAL:
+                return aqp_palette.parse_jasc_palette(str(view, "utf-8"))
+            return bytes(view)
+        finally:
+            view.release()
+
+    def extract(self, out_dir):
+        # Write every entry back out as a file; returns the paths written
+        paths = []
+        for name in self.entries:
+            parts = name.split("/")
+            if name.startswith("/") or ".." in parts:
+                raise ValueError(f"Refusing to extract {name} outside {out_dir}")
+            path = os.path.join(out_dir, *parts)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            view = self.data(name)
+            try:
+                with open(path, "wb") as f:
+                    f.write(view)
+            finally:
+                view.release()
+            paths.append(path)
+        return paths
+
+    def close(self):
+        if self._map is None:
+            return
+        self._view.release()
+        self._map.close()
+        self._file.close()
+        self._map = None
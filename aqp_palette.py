@@ -0,0 +1,104 @@
+import numpy as np
+from PIL import Image
+
+import aqp_color
+
+# Palette helpers shared by the GUI and the headless tools
+
+
+def pad_palette(palette, count=16):
+    palette = list(palette or [])[:count]
+    while len(palette) < count:
+        palette.append((0, 0, 0))
+    return palette
+
+
+def rgb444_levels(palette):
+    # 4-bit level (0-15) of every channel, rounded to the nearest k * 17
+    return (np.asarray(palette, dtype=np.int64).reshape(-1, 3) + 8) // 17
+
+
+def snap_palette(palette):
+    # The palette as the hardware will show it: every channel on the k * 17 lattice
+    return [tuple(int(v) * 17 for v in c) for c in rgb444_levels(palette)]
+
+
+def flat_palette(palette):
+    # Flattened 768-entry list for Image.putpalette
+    return [v for rgb in palette for v in rgb] + [0] * (768 - 3 * len(palette))
+
+
+def nearest_indices(rgb, palette):
+    # Index of the closest palette color (squared RGB distance) for every pixel.
+    # Matches the old per-pixel argmin exactly, including first-index tie breaks,
+    # but only evaluates each distinct color once.
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    shape = rgb.shape[:-1]
+    flat = rgb.reshape(-1, 3)
+    packed = (flat[:, 0].astype(np.uint32) << 16) | (flat[:, 1].astype(np.uint32) << 8) | flat[:, 2]
+    colors, inverse = np.unique(packed, return_inverse=True)
+    uniq = np.stack([(colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF], axis=1).astype(np.int64)
+    pal_arr = np.asarray(palette, dtype=np.int64).reshape(-1, 3)
+    diffs = uniq[:, None, :] - pal_arr[None, :, :]
+    dist = np.sum(diffs * diffs, axis=2)
+    best = np.argmin(dist, axis=1).astype(np.uint8)
+    return best[inverse.reshape(-1)].reshape(shape)
+
+
+def indices_to_image(idxs, palette):
+    h, w = idxs.shape
+    pal_img = Image.frombytes("P", (w, h), np.ascontiguousarray(idxs, dtype=np.uint8).tobytes())
+    pal_img.putpalette(flat_palette(palette))
+    return pal_img
+
+
+def remap_to_palette(img, palette, metric="rgb"):
+    # Remap image colors to the given palette (list of 16 RGB tuples)
+    arr = np.asarray(img.convert("RGB"))
+    return indices_to_image(match_indices(arr, palette, metric), palette)
+
+
+def match_indices(rgb, palette, metric="rgb"):
+    # Exact squared RGB distance, or a perceptual metric through the cached RGB444 table
+    if metric == "rgb":
+        return nearest_indices(rgb, palette)
+    return aqp_color.lut_indices(rgb, palette, metric)
+
+
+def image_palette(img):
+    # First 16 palette entries of a P-mode image as RGB tuples
+    pal = img.getpalette() if img.mode == "P" else None
+    if pal is None:
+        pal = [0] * 48
+    else:
+        pal = list(pal[:48])
+        if len(pal) < 48:
+            pal += [0] * (48 - len(pal))
+    return [(pal[i*3], pal[i*3+1], pal[i*3+2]) for i in range(16)]
+
+
+def read_jasc_palette(file_path):
+    with open(file_path, "r") as f:
+        return parse_jasc_palette(f.read())
+
+
+def parse_jasc_palette(text):
+    lines = text.splitlines()
+    # JASC-PAL format: skip header
+    if lines[0].strip() != "JASC-PAL":
+        raise ValueError("Not a JASC-PAL file")
+    count = int(lines[2].strip())
+    palette = []
+    for line in lines[3:3+count]:
+        r, g, b = map(int, line.strip().split())
+        palette.append((r, g, b))
+    if len(palette) != 16:
+        raise ValueError("Palette must have 16 colors")
+    return palette
+
+
+def write_jasc_palette(file_path, palette):
+    with open(file_path, "w") as f:
+        f.write("JASC-PAL\n0100\n16\n")
+        for r, g, b in palette:
+            f.write(f"{r} {g} {b}\n")
@@ -0,0 +1,209 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+import aqp_cache
+import aqp_cells
+import aqp_color
+import aqp_dither
+import aqp_formats
+import aqp_quantize
+import aqp_text
+from aqp_palette import image_palette, indices_to_image, pad_palette, snap_palette
+
+# Scale -> quantize -> remap pipeline shared by the GUI preview and the CLI
+EXPORT_FORMATS = ["BMP4", "BMP1", "PNG"]
+SCALING_MODES = ["letterbox", "stretch", "fill"]
+SAMPLING_METHODS = ["bicubic", "bilinear", "lanczos", "nearest"]
+DITHER_MODES = aqp_dither.DITHER_METHODS
+CELL_MODES = aqp_cells.CELL_MODES
+COLOR_METRICS = aqp_color.METRICS
+QUANTIZERS = aqp_quantize.QUANTIZERS
+
+RESAMPLE_MAP = {"nearest": Image.NEAREST, "bilinear": Image.BILINEAR, "bicubic": Image.BICUBIC, "lanczos": Image.LANCZOS}
+FILE_EXTENSIONS = {"BMP4": ".bmp4", "BMP1": ".bmp1", "PNG": ".png"}
+BMP4_EXTENSIONS = [".bmp4", ".bm4"]
+BMP1_EXTENSIONS = [".bmp1", ".bm1"]
+SCR_EXTENSIONS = aqp_text.SCR_EXTENSIONS
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff", ".tif", ".webp", ".ico"] + BMP4_EXTENSIONS + BMP1_EXTENSIONS + SCR_EXTENSIONS
+# Imported photos are kept as a proxy covering this many times the largest export size
+PROXY_SCALE = 4
+PROXY_SIZE = (320 * PROXY_SCALE, 200 * PROXY_SCALE)
+
+
+def target_size(export_fmt):
+    if export_fmt == "BMP4":
+        return (160, 200)
+    return (320, 200)
+
+
+def scale_letterbox(img, target_size, resample):
+    img_ratio = img.width / img.height
+    target_ratio = target_size[0] / target_size[1]
+    if img_ratio > target_ratio:
+        new_width = target_size[0]
+        new_height = int(new_width / img_ratio)
+    else:
+        new_height = target_size[1]
+        new_width = int(new_height * img_ratio)
+    img = img.resize((new_width, new_height), resample)
+    result = Image.new("RGB", target_size, (0, 0, 0))
+    x = (target_size[0] - new_width) // 2
+    y = (target_size[1] - new_height) // 2
+    result.paste(img, (x, y))
+    return result
+
+
+def scale_to_fill(img, target_size, resample):
+    img_ratio = img.width / img.height
+    target_ratio = target_size[0] / target_size[1]
+    if img_ratio < target_ratio:
+        scale = target_size[0] / img.width
+    else:
+        scale = target_size[1] / img.height
+    new_size = (int(img.width * scale), int(img.height * scale))
+    img = img.resize(new_size, resample)
+    x = (new_size[0] - target_size[0]) // 2
+    y = (new_size[1] - target_size[1]) // 2
+    img = img.crop((x, y, x + target_size[0], y + target_size[1]))
+    return img
+
+
+def scale_image(img, size, scaling="stretch", sampling="bicubic"):
+    resample = RESAMPLE_MAP.get(sampling, Image.NEAREST)
+    if scaling == "stretch":
+        return img.resize(size, resample)
+    elif scaling == "fill":
+        return scale_to_fill(img, size, resample)
+    return scale_letterbox(img, size, resample)
+
+
+def process_image(img, export_fmt="BMP4", scaling="stretch", sampling="bicubic", dither="floyd", palette=None, adaptive=True, cells="common", metric="rgb", quantizer="median", check=None, cache=None, source_key=None):
+    # Returns the palette-indexed export image and its 16-color palette.
+    # A given palette is forced onto the image, otherwise quantizer picks one:
+    # Pillow's median cut or the RGB444 optimizer in aqp_quantize. Either way the
+    # palette is snapped to the 12-bit hardware colors, so it is what gets saved.
+    # cells picks how BMP1 chooses each 8x8 cell's two colors (see aqp_cells).
+    # metric is the color distance used to match pixels to the palette (see aqp_color).
+    # check, if given, is called between stages and may raise to abandon the work.
+    # With a StageCache each stage is memoized, keyed on source_key (a hash of
+    # the source image, computed if not given) plus the settings it depends on.
+    check = check or (lambda: None)
+    if cache is not None and source_key is None:
+        source_key = aqp_cache.image_key(img)
+
+    def stage(key, compute):
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(key, compute)
+
+    size = target_size(export_fmt)
+    scale_key = ("scale", source_key, scaling, sampling, size)
+    scaled = stage(scale_key, lambda: scale_image(img, size, scaling, sampling))
+    check()
+    forced = tuple(tuple(c) for c in pad_palette(palette)) if palette else None
+    quantize_key = scale_key + ("quantize", forced, adaptive, dither, metric, quantizer)
+    img, palette = stage(quantize_key, lambda: quantize_image(scaled, dither, forced, adaptive, check, metric, quantizer))
+    if export_fmt == "BMP1":
+        check()
+        img = stage(quantize_key + ("cells", cells), lambda: limit_cell_colors(img, scaled, palette, cells, metric))
+    return img, palette
+
+
+def quantize_image(scaled, dither="floyd", palette=None, adaptive=True, check=None, metric="rgb", quantizer="median"):
+    # Scaled image -> (P image, 16-color palette on the RGB444 lattice). The palette
+    # is snapped before dithering, so the dither error is measured against the
+    # colors that are actually shown and saved. adaptive=False keeps the colors of
+    # an image that already has 16 or fewer instead of quantizing it again.
+    own_colors = None if adaptive else scaled.convert("RGB").getcolors(maxcolors=16)
+    if palette:
+        palette = pad_palette(palette)
+    elif own_colors:
+        palette = pad_palette([color for _, color in own_colors])
+    else:
+        palette = image_palette(scaled.convert("P", palette=Image.ADAPTIVE, colors=16, dither=Image.NONE))
+        if quantizer == "rgb444":
+            # Median cut is one of the seeds, so the result is never worse than it
+            hist = aqp_quantize.rgb444_histogram(np.asarray(scaled.convert("RGB")))
+            palette = aqp_quantize.optimize_palette(hist, seeds=[palette])
+        if check:
+            check()
+    palette = snap_palette(palette)
+    # Dither (or plain remap for "none") against the snapped palette
+    return indices_to_image(aqp_dither.dither(np.asarray(scaled.convert("RGB")), palette, dither, metric), palette), palette
+
+
+def limit_cell_colors(img, scaled, palette, cells="common", metric="rgb"):
+    # Preview exactly what BMP1 can store: two colors per 8x8 cell
+    if cells == "optimal":
+        indices, fg, bg = aqp_cells.optimal_cell_colors(np.asarray(scaled.convert("RGB")), palette, metric)
+    elif cells == "dither":
+        indices, fg, bg = aqp_cells.dither_cells(np.asarray(scaled.convert("RGB")), palette, metric)
+    else:
+        indices = np.asarray(img)
+        fg, bg = aqp_formats.most_common_cell_colors(indices)
+        indices = aqp_formats.apply_cell_colors(indices, fg, bg)
+    return indices_to_image(indices, palette)
+
+
+def encode_image(img, palette, export_fmt):
+    if export_fmt == "BMP4":
+        return aqp_formats.encode_bmp4(img, palette)
+    if export_fmt == "BMP1":
+        return aqp_formats.encode_bmp1(img, palette)
+    raise ValueError(f"Unknown export type: {export_fmt}")
+
+
+def load_image(file_path, proxy_size=None):
+    # Returns (image, embedded palette or None); BMP4/BMP1 carry their own palette,
+    # SCR text screens render with AQUASCII and the default text palette. With
+    # proxy_size, other images load as a WorkingImage proxy, as the GUI does.
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in SCR_EXTENSIONS:
+        return aqp_text.load_scr(file_path), list(aqp_text.DEFAULT_PALETTE)
+    if ext in BMP4_EXTENSIONS or ext in BMP1_EXTENSIONS:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if ext in BMP4_EXTENSIONS:
+            indices, palette = aqp_formats.decode_bmp4(data)
+        else:
+            indices, palette = aqp_formats.decode_bmp1(data)
+        return indices_to_image(indices, palette), palette
+    if proxy_size:
+        return WorkingImage.open(file_path, proxy_size).proxy, None
+    img = Image.open(file_path)
+    img.load()
+    return img, None
+
+
+class WorkingImage:
+    # An imported image decoded only as large as previews and exports need.
+    # JPEGs decode at a reduced DCT scale (Image.draft) and other large images
+    # are box-reduced, down to a proxy that still covers proxy_size on both axes.
+    # PROXY_SIZE is PROXY_SCALE times every export size, and fill-mode crops keep
+    # the full height or width, so the full-resolution image is never decoded.
+    def __init__(self, file_path, proxy, full_size):
+        self.file_path = file_path
+        self.proxy = proxy
+        self.full_size = full_size
+
+    @classmethod
+    def open(cls, file_path, proxy_size=PROXY_SIZE):
+        img = Image.open(file_path)
+        full_size = img.size
+        if img.format == "JPEG":
+            img.draft("RGB", proxy_size)
+        img.load()
+        factor = min(img.width // proxy_size[0], img.height // proxy_size[1])
+        if factor >= 2 and img.mode in ("RGB", "RGBA", "L", "LA"):
+            img = img.reduce(factor)
+        return cls(file_path, img, full_size)
+
+
+def save_image(img, palette, export_fmt, file_path):
+    if export_fmt == "PNG":
+        img.save(file_path, format="PNG")
+        return
+    with open(file_path, "wb") as f:
+        f.write(encode_image(img, palette, export_fmt))
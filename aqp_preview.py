@@ -0,0 +1,61 @@
+import queue
+import threading
+import traceback
+
+# Background render worker for the GUI preview. Only the newest submitted job
+# matters: older pending jobs are dropped and a running job is cancelled at the
+# next check() once something newer arrives. Results go to a queue that the Tk
+# main loop drains with root.after, so no Tk calls happen off the main thread.
+
+
+class PreviewCancelled(Exception):
+    pass
+
+
+class PreviewWorker:
+    def __init__(self):
+        self.results = queue.Queue()
+        self._cond = threading.Condition()
+        self._job = None
+        self._latest = 0
+        self._thread = threading.Thread(target=self._run, name="preview-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, generation, func, *args):
+        # func(*args, check) runs on the worker; check() raises PreviewCancelled once stale
+        with self._cond:
+            self._job = (generation, func, args)
+            self._latest = generation
+            self._cond.notify()
+
+    def cancel(self, generation):
+        # Mark everything up to generation as stale without starting new work
+        with self._cond:
+            self._latest = max(self._latest, generation)
+            if self._job is not None and self._job[0] <= generation:
+                self._job = None
+
+    def is_stale(self, generation):
+        return generation != self._latest
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._job is None:
+                    self._cond.wait()
+                generation, func, args = self._job
+                self._job = None
+
+            def check():
+                if self.is_stale(generation):
+                    raise PreviewCancelled()
+            try:
+                result = func(*args, check)
+                error = None
+            except PreviewCancelled:
+                continue
+            except Exception as e:
+                result = None
+                error = f"{e}\n\n{traceback.format_exc()}"
+            if not self.is_stale(generation):
+                self.results.put((generation, result, error))
@@ -0,0 +1,224 @@
+import math
+import warnings
+
+import numpy as np
+from PIL import Image
+
+from aqp_color import RGB444_COLORS, rgb444_index
+
+# Palette generation directly in the Aquarius+ 12-bit color space. The source is
+# reduced to a histogram over the 4096 RGB444 colors, so the cost of optimizing
+# does not depend on the image size, and every result lies on the k * 17 lattice
+# that BMP4/BMP1 files store. Deterministic: no random seeding anywhere.
+QUANTIZERS = ["median", "rgb444"]
+QUANTIZER_LABELS = {"median": "Median Cut", "rgb444": "RGB444 Optimized"}
+# Palette extraction from files decodes JPEGs at a reduced DCT scale down to about
+# this many pixels, reads larger uncompressed files (BMP, TGA, TIFF, PPM) in bands
+# of HISTOGRAM_BAND_ROWS rows, and feeds the histogram one band at a time
+HISTOGRAM_MAX_PIXELS = 4_000_000
+HISTOGRAM_BAND_ROWS = 256
+
+
+def rgb444_histogram(rgb):
+    # Pixel count of every RGB444 color (4096 bins, indexed by r << 8 | g << 4 | b)
+    return np.bincount(rgb444_index(np.asarray(rgb, dtype=np.uint8)).ravel(), minlength=4096)
+
+
+def image_histogram(img, band_rows=HISTOGRAM_BAND_ROWS):
+    # rgb444_histogram of a PIL image of any mode, converted one band at a time
+    # so no full-size RGB copy or index array is ever built
+    hist = np.zeros(4096, dtype=np.int64)
+    for top in range(0, img.height, band_rows):
+        band = img.crop((0, top, img.width, min(top + band_rows, img.height))).convert("RGB")
+        hist += rgb444_histogram(np.asarray(band))
+    return hist
+
+
+def raw_bands(img, band_rows=HISTOGRAM_BAND_ROWS):
+    # Row bands of an unloaded image whose pixels are stored uncompressed, read
+    # straight from the file so the whole image is never in memory at once.
+    # Bands come in file order (bottom-up files upside down), which a histogram
+    # does not care about. None when the file has compressed or partial-width tiles.
+    tiles = []
+    for tile in img.tile:
+        args = (tile.args,) if isinstance(tile.args, str) else tuple(tile.args)
+        x0, y0, x1, y1 = tile.extents
+        if tile.codec_name != "raw" or (x0, x1) != (0, img.width):
+            return None
+        rawmode, stride, orientation = (args + (0, 1))[:3]
+        if not stride:
+            try:
+                stride = len(Image.new(img.mode, (img.width, 1)).tobytes("raw", rawmode))
+            except ValueError:
+                return None
+        tiles.append((tile.offset, y1 - y0, rawmode, stride, orientation))
+
+    def bands():
+        for offset, rows, rawmode, stride, orientation in tiles:
+            for top in range(0, rows, band_rows):
+                count = min(band_rows, rows - top)
+                img.fp.seek(offset + top * stride)
+                band = Image.frombytes(img.mode, (img.width, count), img.fp.read(count * stride), "raw", rawmode, stride, orientation)
+                if img.mode == "P":
+                    band.palette = img.palette.copy()
+                yield band
+    return bands()
+
+
+def file_histogram(file_path, max_pixels=HISTOGRAM_MAX_PIXELS):
+    # Histogram of an image file. JPEGs are decoded with Image.draft at the
+    # smallest DCT scale (1/2 .. 1/8) still holding about max_pixels, which a
+    # color histogram does not need more than. Larger uncompressed files are read
+    # in raw_bands; other compressed formats (PNG, WebP, compressed TIFF) still
+    # decode in full, as Pillow cannot decode them partially.
+    # Large scans are expected here, so Pillow's decompression bomb warning is muted.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        img = Image.open(file_path)
+    with img:
+        if img.width * img.height > max_pixels:
+            if img.format == "JPEG":
+                f = math.sqrt(max_pixels / (img.width * img.height))
+                img.draft("RGB", (max(1, int(img.width * f)), max(1, int(img.height * f))))
+            else:
+                bands = raw_bands(img)
+                if bands is not None:
+                    hist = np.zeros(4096, dtype=np.int64)
+                    for band in bands:
+                        hist += rgb444_histogram(np.asarray(band.convert("RGB")))
+                    return hist
+        img.load()
+        return image_histogram(img)
+
+
+def palette_from_file(file_path, colors=16):
+    # Optimized RGB444 palette of an image file of any size
+    return optimize_palette(file_histogram(file_path), colors)
+
+
+def palette_error(hist, palette):
+    # Summed squared RGB error of the histogram against its nearest palette colors
+    pts, weights = _histogram_points(hist)
+    return float((weights * _nearest(pts, np.asarray(palette, dtype=np.float64))[1]).sum())
+
+
+def optimize_palette(hist, colors=16, seeds=(), iterations=24):
+    # Weighted k-means over the occupied histogram bins, started from a weighted
+    # median cut, a farthest-point spread and any given seed palettes (such as
+    # Pillow's median cut). Each run is snapped to the lattice and re-refined there;
+    # the lowest-error snapped palette wins, so a seed is never beaten by the result.
+    pts, weights = _histogram_points(hist)
+    if len(pts) <= colors:
+        palette = [tuple(int(v) for v in c) for c in pts]
+        return palette + [palette[0] if palette else (0, 0, 0)] * (colors - len(palette))
+    starts = [_snap(np.asarray(s, dtype=np.float64).reshape(-1, 3)[:colors]) for s in seeds]
+    starts += [_median_cut(pts, weights, colors), _farthest_points(pts, weights, colors)]
+    best, best_err = None, np.inf
+    for start in starts:
+        refined = _kmeans(pts, weights, _fill(pts, weights, start, colors), iterations)
+        candidates = [_snapped_kmeans(pts, weights, refined, iterations)]
+        if len(start) == colors:
+            candidates.append(_snap(start))
+        for palette in candidates:
+            err = float((weights * _nearest(pts, palette)[1]).sum())
+            if err < best_err:
+                best, best_err = palette, err
+    return [tuple(int(v) for v in c) for c in best]
+
+
+def _histogram_points(hist):
+    hist = np.asarray(hist)
+    occupied = np.flatnonzero(hist)
+    return RGB444_COLORS[occupied].astype(np.float64), hist[occupied].astype(np.float64)
+
+
+def _nearest(pts, palette):
+    # (labels, squared distance) of every point to its closest palette color
+    dist = ((pts[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
+    labels = np.argmin(dist, axis=1)
+    return labels, dist[np.arange(len(pts)), labels]
+
+
+def _snap(palette):
+    return np.clip(np.floor(palette / 17 + 0.5), 0, 15) * 17
+
+
+def _fill(pts, weights, palette, colors):
+    # Top up a short (or deduplicated) palette with the worst-served points
+    palette = np.unique(palette, axis=0) if len(palette) else np.empty((0, 3))
+    while len(palette) < colors:
+        if len(palette):
+            cost = weights * _nearest(pts, palette)[1]
+        else:
+            cost = weights.copy()
+        palette = np.vstack([palette, pts[np.argmax(cost)]])
+    return palette
+
+
+def _centroids(pts, weights, labels, palette):
+    # Weighted mean of every cluster; an empty cluster moves to the worst-served point
+    counts = np.bincount(labels, weights=weights, minlength=len(palette))
+    sums = np.stack([np.bincount(labels, weights=weights * pts[:, c], minlength=len(palette)) for c in range(3)], axis=1)
+    out = palette.copy()
+    used = counts > 0
+    out[used] = sums[used] / counts[used, None]
+    for i in np.flatnonzero(~used):
+        cost = weights * _nearest(pts, out)[1]
+        out[i] = pts[np.argmax(cost)]
+    return out
+
+
+def _kmeans(pts, weights, palette, iterations):
+    labels = None
+    for _ in range(iterations):
+        new_labels = _nearest(pts, palette)[0]
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        palette = _centroids(pts, weights, labels, palette)
+    return palette
+
+
+def _snapped_kmeans(pts, weights, palette, iterations):
+    # Lloyd steps constrained to the lattice: assign, average, snap, until stable
+    palette = _snap(palette)
+    for _ in range(iterations):
+        labels = _nearest(pts, palette)[0]
+        moved = _snap(_centroids(pts, weights, labels, palette))
+        if np.array_equal(moved, palette):
+            break
+        palette = moved
+    return palette
+
+
+def _median_cut(pts, weights, colors):
+    # Weighted median cut: split the box with the largest weighted spread
+    # at the weighted median of its widest channel
+    boxes = [np.arange(len(pts))]
+    while len(boxes) < colors:
+        spread = []
+        for box in boxes:
+            if len(box) < 2:
+                spread.append(-1.0)
+                continue
+            mean = np.average(pts[box], axis=0, weights=weights[box])
+            spread.append(float((weights[box, None] * (pts[box] - mean) ** 2).sum()))
+        i = int(np.argmax(spread))
+        if spread[i] <= 0:
+            break
+        box = boxes.pop(i)
+        channel = int(np.argmax(pts[box].max(axis=0) - pts[box].min(axis=0)))
+        order = box[np.argsort(pts[box, channel], kind="stable")]
+        cum = np.cumsum(weights[order])
+        cut = int(np.clip(np.searchsorted(cum, cum[-1] / 2), 0, len(order) - 2)) + 1
+        boxes += [order[:cut], order[cut:]]
+    return np.array([np.average(pts[box], axis=0, weights=weights[box]) for box in boxes])
+
+
+def _farthest_points(pts, weights, colors):
+    # Heaviest color first, then repeatedly the point with the largest weighted distance
+    palette = pts[[int(np.argmax(weights))]]
+    while len(palette) < colors:
+        cost = weights * _nearest(pts, palette)[1]
+        palette = np.vstack([palette, pts[np.argmax(cost)]])
+    return palette
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Bundled asset lookup, shared by the GUI and the headless modules. Frozen
+# (PyInstaller) builds unpack the assets folder into sys._MEIPASS; from source
+# it sits next to this file.
+
+
+def resource_path(relative_path):
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except AttributeError:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, relative_path)
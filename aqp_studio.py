@@ -1,17 +1,37 @@
+import sys
+
+# Subcommands handled headlessly by aqp_cli instead of opening the window.
+# Dispatched before tkinter is imported, so batch runs work without a display.
+CLI_COMMANDS = ("convert", "anim", "palette", "pack", "list", "unpack", "text", "render", "tiles", "vram")
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+    # Needed for the batch worker pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    import aqp_cli
+    sys.exit(aqp_cli.main(sys.argv[1:]))
+
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import os
-import sys
-
-# Helper for asset path resolution (PyInstaller compatibility)
-def resource_path(relative_path):
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except AttributeError:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+import aqp_anim
+import aqp_cache
+import aqp_color
+import aqp_compress
+import aqp_dither
+import aqp_formats
+import aqp_palette
+import aqp_pipeline
+import aqp_quantize
+import aqp_text
+import aqp_tiles
+from aqp_preview import PreviewWorker
+from aqp_resources import resource_path
+from tabs.gallery_tab import GalleryTab
+from tabs.text_tab import TextTab
+
+PREVIEW_DEBOUNCE_MS = 80  # Wait for rapid control changes to settle before rendering
+PREVIEW_POLL_MS = 20
 
 class AQPStudio:
     def __init__(self, root):
@@ -19,6 +39,9 @@ class AQPStudio:
         self.root.title("AQP Studio")
         self.root.configure(bg="#D0D0D0")  # 20% grey background
         self.image = None
+        self.image_key = None  # Content hash of self.image for the stage cache
+        self.working_image = None  # Reduced-size proxy of an imported photo (see aqp_pipeline.WorkingImage)
+        self.frames_path = None  # Source file when the imported image has several frames
         self.img_preview = None
         self.loaded_palette = None  # List of (R,G,B) tuples
         self.palette_var = tk.BooleanVar(value=True)
@@ -26,12 +49,24 @@ class AQPStudio:
         self.scaling_var = tk.StringVar(value="letterbox")
         self.sampling_var = tk.StringVar(value="bicubic")
         self.export_format_var = tk.StringVar(value="BMP4")
+        self.cell_mode_var = tk.StringVar(value="common")
+        self.metric_var = tk.StringVar(value="rgb")
+        self.quantizer_var = tk.StringVar(value="median")
+        # Preview renders run on a worker thread, tagged with a generation counter
+        self.preview_worker = PreviewWorker()
+        self._preview_generation = 0
+        self._preview_shown = 0
+        self._preview_after = None
+        self._preview_polling = False
+        self.stage_cache = aqp_cache.StageCache()
         self.setup_gui()
 
     def save_palette(self):
+        self.flush_preview()
         # Get current palette (forced or preview)
         if self.force_palette_var.get() and self.loaded_palette:
-            palette = list(self.loaded_palette)[:16]
+            # Snapped, so swatches and saved files match what the export uses
+            palette = aqp_palette.snap_palette(list(self.loaded_palette)[:16])
             while len(palette) < 16:
                 palette.append((0,0,0))
         else:
@@ -43,10 +78,7 @@ class AQPStudio:
         if not file_path:
             return
         try:
-            with open(file_path, "w") as f:
-                f.write("JASC-PAL\n0100\n16\n")
-                for r, g, b in palette:
-                    f.write(f"{r} {g} {b}\n")
+            aqp_palette.write_jasc_palette(file_path, palette)
         except Exception as e:
             import traceback
             tb = traceback.format_exc()
@@ -57,37 +89,36 @@ class AQPStudio:
         self._export_img = img
         self._export_palette = palette
     def get_padded_palette(self, img):
-        pal = img.getpalette() if img.mode == "P" else None
-        if pal is None:
-            pal = [0] * 48
-        else:
-            pal = list(pal[:48])
-            if len(pal) < 48:
-                pal += [0] * (48 - len(pal))
-        return [(pal[i*3], pal[i*3+1], pal[i*3+2]) for i in range(16)]
+        return aqp_palette.image_palette(img)
     def load_palette(self):
         file_path = filedialog.askopenfilename(filetypes=[("Palette Files", "*.pal")])
         if not file_path:
             return
         try:
-            with open(file_path, "r") as f:
-                lines = f.readlines()
-            # JASC-PAL format: skip header
-            if lines[0].strip() != "JASC-PAL":
-                raise ValueError("Not a JASC-PAL file")
-            count = int(lines[2].strip())
-            palette = []
-            for line in lines[3:3+count]:
-                r, g, b = map(int, line.strip().split())
-                palette.append((r, g, b))
-            if len(palette) != 16:
-                raise ValueError("Palette must have 16 colors")
-            self.loaded_palette = palette
+            self.loaded_palette = aqp_palette.read_jasc_palette(file_path)
             # After loading palette, set Force palette on image checkbox
             self.force_palette_var.set(True)
             self.update_preview()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load palette: {e}")
+    def palette_from_image(self):
+        # Extract an optimized palette from any image file without keeping it in memory
+        file_path = filedialog.askopenfilename(filetypes=[
+            ("Image Files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif;*.tiff;*.tif;*.webp")
+        ])
+        if not file_path:
+            return
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            self.loaded_palette = aqp_quantize.palette_from_file(file_path)
+            self.force_palette_var.set(True)
+            self.update_palette_preview()
+            self.update_preview()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to extract palette: {e}")
+        finally:
+            self.root.config(cursor="")
     # Duplicate __init__ removed
 
     def setup_gui(self):
@@ -101,10 +132,12 @@ class AQPStudio:
 
         notebook = ttk.Notebook(self.root)
         notebook.pack(fill=tk.BOTH, expand=True, padx=4, pady=4)
+        self.notebook = notebook
 
         # AQ+ Images tab
         bmp4_frame = tk.Frame(notebook, bg="#D0D0D0")
         notebook.add(bmp4_frame, text="AQ+ Images")
+        self.images_tab = bmp4_frame
 
         preview_frame = tk.Frame(bmp4_frame, bg="#D0D0D0")
         preview_frame.pack(pady=10, padx=20)
@@ -162,6 +195,9 @@ class AQPStudio:
         export_format_frame.pack(pady=(8,0))
         for fmt in ["BMP4", "BMP1", "PNG"]:
             tk.Radiobutton(export_format_frame, bg="#D0D0D0", text=fmt, variable=self.export_format_var, value=fmt, command=self.update_preview).pack(side=tk.LEFT)
+        self.export_frames_btn = tk.Button(export_btn_frame, bg="#D0D0D0", text="Export All Frames...", state=tk.DISABLED, command=self.export_frames)
+        self.export_frames_btn.pack(pady=(8,0))
+        tk.Button(export_btn_frame, bg="#D0D0D0", text="Export Tiles...", command=self.export_tiles).pack(pady=(4,0))
 
         palette_section_frame = tk.Frame(bmp4_frame, bg="#D0D0D0")
         palette_section_frame.pack(pady=10, fill=tk.X)
@@ -184,8 +220,17 @@ class AQPStudio:
         self.dither_var = tk.StringVar(value="floyd")
         dither_frame = tk.LabelFrame(self.image_controls_frame, bg="#D0D0D0", padx="6", borderwidth="0", text="Output Dithering")
         dither_frame.pack(fill=tk.X, pady=(2,4))
-        for dither, label in [("floyd", "Floyd-Steinberg"), ("none", "None")]:
-            tk.Radiobutton(dither_frame, bg="#D0D0D0", text=label, variable=self.dither_var, value=dither, command=self.update_preview).pack(side=tk.LEFT)
+        for i, dither in enumerate(aqp_dither.DITHER_METHODS):
+            label = aqp_dither.DITHER_LABELS[dither]
+            tk.Radiobutton(dither_frame, bg="#D0D0D0", text=label, variable=self.dither_var, value=dither, command=self.update_preview).grid(row=i // 3, column=i % 3, sticky="w")
+        cells_frame = tk.LabelFrame(self.image_controls_frame, bg="#D0D0D0", padx="6", borderwidth="0", text="BMP1 Cell Colors")
+        cells_frame.pack(fill=tk.X, pady=(2,4))
+        for mode, label in [("common", "Most Common"), ("optimal", "Best Fit"), ("dither", "Dithered")]:
+            tk.Radiobutton(cells_frame, bg="#D0D0D0", text=label, variable=self.cell_mode_var, value=mode, command=self.update_preview).pack(side=tk.LEFT)
+        metric_frame = tk.LabelFrame(self.image_controls_frame, bg="#D0D0D0", padx="6", borderwidth="0", text="Color Matching")
+        metric_frame.pack(fill=tk.X, pady=(2,4))
+        for metric in aqp_color.METRICS:
+            tk.Radiobutton(metric_frame, bg="#D0D0D0", text=aqp_color.METRIC_LABELS[metric], variable=self.metric_var, value=metric, command=self.update_preview).pack(side=tk.LEFT)
 
         palette_frame = tk.LabelFrame(palette_section_frame, bg="#D0D0D0", padx="12", pady="4", text="Palette Options")
         palette_frame.grid(row=0, column=1, padx=10, sticky="nsew")
@@ -193,7 +238,12 @@ class AQPStudio:
         btn_frame.pack(pady=(4, 8))
         tk.Button(btn_frame, bg="#D0D0D0", text="Load Palette...", command=self.load_palette).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, bg="#D0D0D0", text="Save Palette...", command=self.save_palette).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, bg="#D0D0D0", text="Palette from Image...", command=self.palette_from_image).pack(side=tk.LEFT, padx=5)
         tk.Checkbutton(palette_frame, padx="54", bg="#D0D0D0", text="Use imported palette", variable=self.force_palette_var, command=self.update_preview).pack(anchor="w")
+        quantizer_frame = tk.Frame(palette_frame, bg="#D0D0D0")
+        quantizer_frame.pack(anchor="w", padx=50)
+        for quantizer in aqp_quantize.QUANTIZERS:
+            tk.Radiobutton(quantizer_frame, bg="#D0D0D0", text=aqp_quantize.QUANTIZER_LABELS[quantizer], variable=self.quantizer_var, value=quantizer, command=self.update_preview).pack(side=tk.LEFT)
 
         self.palette_preview_frame = tk.LabelFrame(palette_section_frame, bg="#D0D0D0", text="Output Palette")
         self.palette_preview_frame.grid(row=0, column=2, padx=(10, 30), sticky="nsew")  # Add more right padding
@@ -212,6 +262,14 @@ class AQPStudio:
         controls_frame = tk.Frame(bmp4_frame, bg="#D0D0D0")
         controls_frame.pack(pady=10)
 
+        # Gallery tab: thumbnails of a folder, double-click to import
+        self.gallery_tab = GalleryTab(notebook, self)
+        notebook.add(self.gallery_tab, text="Gallery")
+
+        # Text Screen tab: bloxel painting, saved as SCR
+        self.text_tab = TextTab(notebook, self)
+        notebook.add(self.text_tab, text="Text Screen")
+
     def set_image_controls_state(self, state):
         # Helper to enable/disable all controls in Image Controls section
         for child in self.image_controls_frame.winfo_children():
@@ -226,19 +284,34 @@ class AQPStudio:
 
     def import_image(self):
         file_path = filedialog.askopenfilename(filetypes=[
-            ("Image Files", "*.png;*.jpg;*.jpeg;*.bmp;*.bmp4;*.bm4;*.bmp1;*.bm1;*.gif;*.tiff;*.tif;*.webp;*.ico")
+            ("Image Files", "*.png;*.jpg;*.jpeg;*.bmp;*.bmp4;*.bm4;*.bmp1;*.bm1;*.gif;*.tiff;*.tif;*.webp;*.ico"),
+            ("Aquarius+ Text Screens", "*.scr;*.scrn")
         ])
         if not file_path:
             return
+        self.open_image_file(file_path)
+
+    def open_image_file(self, file_path):
+        # Import by path (from the dialog or the gallery) and show the AQ+ Images tab
+        self.notebook.select(self.images_tab)
         ext = os.path.splitext(file_path)[1].lower()
         if ext in [".bmp4", ".bm4"]:
-            self.import_bmp4(file_path)
+            self.import_indexed(file_path, aqp_formats.decode_bmp4, "BMP4/BM4")
             return
         if ext in [".bmp1", ".bm1"]:
-            self.import_bmp1(file_path)
+            self.import_indexed(file_path, aqp_formats.decode_bmp1, "BMP1/BM1")
+            return
+        if ext in aqp_text.SCR_EXTENSIONS:
+            self.import_indexed(file_path, aqp_text.decode_scr, "SCR")
             return
         try:
-            self.image = Image.open(file_path)
+            # Decoded now, at proxy size, so the preview thread never triggers a lazy load
+            self.working_image = aqp_pipeline.WorkingImage.open(file_path)
+            self.image = self.working_image.proxy
+            with Image.open(file_path) as img:
+                self.frames_path = file_path if aqp_anim.frame_count(img) > 1 else None
+            self.export_frames_btn.config(state=tk.NORMAL if self.frames_path else tk.DISABLED)
+            self.image_key = aqp_cache.image_key(self.image)
             self.show_original(self.image)
             self.update_preview()
             self.export_btn.config(state=tk.NORMAL)
@@ -249,114 +322,21 @@ class AQPStudio:
             with open("error_log.txt", "w") as f:
                 f.write(f"Failed to load image: {e}\n\n{tb}")
             messagebox.showerror("Error", f"Failed to load image: {e}\nSee error_log.txt for details.")
-    def import_bmp1(self, file_path):
-        if not file_path:
-            return
-        try:
-            with open(file_path, "rb") as f:
-                data = f.read()
-            if len(data) < 8000 + 1000 + 32:
-                raise ValueError("File too small to be valid BMP1/BM1")
-            # Parse color cells and palette only, ignore bitmap
-            cell_bytes = data[8000:9000]
-            palette_bytes = data[9000:9032]
-            # Decode palette: 16 colors, 2 bytes each (Aquarius+ format)
-            palette = []
-            for i in range(16):
-                b0 = palette_bytes[i*2]
-                b1 = palette_bytes[i*2+1]
-                g = (b0 >> 4) & 0x0F
-                b = b0 & 0x0F
-                r = b1 & 0x0F
-                palette.append((r*17, g*17, b*17))
-            cell_colors = []
-            for b in cell_bytes:
-                fg = (b >> 4) & 0x0F
-                bg = b & 0x0F
-                cell_colors.append((fg, bg))
-            # Bitmap parsing enabled; placeholder code commented for reference
-            bitmap_bytes = data[:8000]
-            img = Image.new("P", (320, 200))
-            img.putpalette([v for rgb in palette for v in rgb] + [0]*(768-3*len(palette)))
-            pixels = [0] * (320*200)
-            # Correct row-major bitmap parsing
-            for y in range(200):
-                for x in range(320):
-                    bit_index = y * 320 + x
-                    byte_index = bit_index // 8
-                    bit = 7 - (bit_index % 8)
-                    if byte_index < len(bitmap_bytes):
-                        byte = bitmap_bytes[byte_index]
-                        val = (byte >> bit) & 1
-                        # Find cell for this pixel
-                        cell_x = x // 8
-                        cell_y = y // 8
-                        cell_idx = cell_y * 40 + cell_x
-                        fg, bg = cell_colors[cell_idx]
-                        color = fg if val else bg
-                        pixels[y * 320 + x] = color
-            img.putdata(pixels)
-            # --- Placeholder code for reference ---
-            # for cell_idx, (fg, bg) in enumerate(cell_colors):
-            #     cell_y = (cell_idx // 40) * 8
-            #     cell_x = (cell_idx % 40) * 8
-            #     # Draw 2-pixel wide background frame
-            #     for y in range(8):
-            #         for x in range(8):
-            #             if x < 2 or x > 5 or y < 2 or y > 5:
-            #                 pixels[(cell_y + y) * 320 + (cell_x + x)] = bg
-            #     # Draw centered 4x4 foreground box
-            #     for y in range(2, 6):
-            #         for x in range(2, 6):
-            #             pixels[(cell_y + y) * 320 + (cell_x + x)] = fg
-            self.image = img
-            self.loaded_palette = palette
-            self.show_original(img)
-            self.update_preview()
-            self.export_btn.config(state=tk.NORMAL)
-            self.set_image_controls_state("normal")
-        except Exception as e:
-            import traceback
-            tb = traceback.format_exc()
-            with open("error_log.txt", "w") as f:
-                f.write(f"Failed to load BMP1/BM1: {e}\n\n{tb}")
-            messagebox.showerror("Error", f"Failed to load BMP1/BM1: {e}\nSee error_log.txt for details.")
-
-    def import_bmp4(self, file_path):
+    def import_indexed(self, file_path, decode, label):
+        # Import a file that carries its own palette; decode turns the file's
+        # bytes into (indices, palette), like aqp_formats.decode_bmp4
         if not file_path:
             return
         try:
             with open(file_path, "rb") as f:
                 data = f.read()
-            if len(data) < 16000 + 32:
-                raise ValueError("File too small to be valid BMP4/BM4")
-            pixel_bytes = data[:16000]
-            palette_bytes = data[-32:]
-            # Decode palette: 16 colors, 2 bytes each (G4B4, R4)
-            palette = []
-            for i in range(16):
-                g_b = palette_bytes[i*2]
-                r = palette_bytes[i*2+1] & 0x0F
-                g = (g_b >> 4) & 0x0F
-                b = g_b & 0x0F
-                # Convert 4-bit to 8-bit
-                r8 = r << 4
-                g8 = g << 4
-                b8 = b << 4
-                palette.append((r8, g8, b8))
-            # Decode pixel data
-            img = Image.new("P", (160, 200))
-            img.putpalette([v for rgb in palette for v in rgb] + [0]*(768-3*len(palette)))
-            pixels = []
-            for byte in pixel_bytes:
-                p1 = (byte >> 4) & 0x0F
-                p2 = byte & 0x0F
-                pixels.append(p1)
-                pixels.append(p2)
-            if len(pixels) > 160*200:
-                pixels = pixels[:160*200]
-            img.putdata(pixels)
+            indices, palette = decode(data)
+            img = aqp_palette.indices_to_image(indices, palette)
             self.image = img
+            self.working_image = None
+            self.frames_path = None
+            self.export_frames_btn.config(state=tk.DISABLED)
+            self.image_key = aqp_cache.image_key(img)
             self.loaded_palette = palette
             self.show_original(img)
             self.update_preview()
@@ -366,89 +346,102 @@ class AQPStudio:
             import traceback
             tb = traceback.format_exc()
             with open("error_log.txt", "w") as f:
-                f.write(f"Failed to load BMP4/BM4: {e}\n\n{tb}")
-            messagebox.showerror("Error", f"Failed to load BMP4/BM4: {e}\nSee error_log.txt for details.")
+                f.write(f"Failed to load {label}: {e}\n\n{tb}")
+            messagebox.showerror("Error", f"Failed to load {label}: {e}\nSee error_log.txt for details.")
 
     def update_preview(self):
+        # Debounced: the render starts once the controls stop changing, and any
+        # render still running for older settings is abandoned.
         if self.image is None:
             return
-        img = self.image.copy()
-        export_fmt = self.export_format_var.get()
-        if export_fmt == "BMP4":
-            target_size = (160, 200)
-        else:
-            target_size = (320, 200)
-        # Scaling
-        scaling = self.scaling_var.get()
-        sampling = self.sampling_var.get()
-        resample_map = {"nearest": Image.NEAREST, "bilinear": Image.BILINEAR, "bicubic": Image.BICUBIC, "lanczos": Image.LANCZOS}
-        resample = resample_map.get(sampling, Image.NEAREST)
-        if scaling == "stretch":
-            img = img.resize(target_size, resample)
-        elif scaling == "fill":
-            img = self.scale_to_fill(img, target_size, resample)
-        else:  # letterbox
-            img = self.scale_letterbox(img, target_size, resample)
-        # Palette reduction logic
+        self._preview_generation += 1
+        self.preview_worker.cancel(self._preview_generation)
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+        self._preview_after = self.root.after(PREVIEW_DEBOUNCE_MS, self.start_preview_render)
+
+    def preview_settings(self, export=False):
+        # Snapshot of the Tk controls, taken on the main thread. Live previews
+        # swap export-only dither methods for their stand-in (see aqp_dither).
         palette = None
-        dither_map = {"floyd": Image.FLOYDSTEINBERG, "none": Image.NONE}
-        dither = dither_map.get(getattr(self, 'dither_var', tk.StringVar(value="floyd")).get(), Image.FLOYDSTEINBERG)
         if self.force_palette_var.get() and self.loaded_palette:
             # Use loaded palette, force remap
-            palette = list(self.loaded_palette)[:16]
-            while len(palette) < 16:
-                palette.append((0,0,0))
-            img = self.remap_to_palette(img, palette)
-        elif self.palette_var.get():
-            # Use median cut (ADAPTIVE) palette
-            img = img.convert("P", palette=Image.ADAPTIVE, colors=16, dither=dither)
-            palette = self.get_padded_palette(img)
-            img = self.remap_to_palette(img, palette)
-        else:
-            # Use image's own palette if <=16 colors, otherwise reduce
-            if img.mode == "P" and len(img.getcolors(maxcolors=256) or []) <= 16:
-                palette = self.get_padded_palette(img)
+            palette = list(self.loaded_palette)
+        dither = getattr(self, 'dither_var', tk.StringVar(value="floyd")).get()
+        return {
+            "export_fmt": self.export_format_var.get(),
+            "scaling": self.scaling_var.get(),
+            "sampling": self.sampling_var.get(),
+            "dither": dither if export else aqp_dither.EXPORT_ONLY_METHODS.get(dither, dither),
+            "palette": palette,
+            "adaptive": self.palette_var.get(),
+            "cells": self.cell_mode_var.get(),
+            "metric": self.metric_var.get(),
+            "quantizer": self.quantizer_var.get(),
+        }
+
+    def render_preview(self, image, source_key, settings, check=None):
+        # Runs on the preview worker thread: no Tk calls in here
+        img, palette = aqp_pipeline.process_image(image, check=check, cache=self.stage_cache, source_key=source_key, **settings)
+        preview_key = ("preview", source_key) + tuple((k, repr(v)) for k, v in sorted(settings.items()))
+        preview = self.stage_cache.get_or_compute(preview_key, lambda: img.resize((480, 300), Image.NEAREST))
+        return img, palette, preview
+
+    def start_preview_render(self):
+        self._preview_after = None
+        self.preview_worker.submit(self._preview_generation, self.render_preview, self.image, self.image_key, self.preview_settings())
+        if not self._preview_polling:
+            self._preview_polling = True
+            self.root.after(PREVIEW_POLL_MS, self.poll_preview)
+
+    def poll_preview(self):
+        while not self.preview_worker.results.empty():
+            generation, result, error = self.preview_worker.results.get()
+            if generation != self._preview_generation:
+                continue
+            self._preview_shown = generation
+            if error:
+                messagebox.showerror("Error", f"Failed to update preview: {error.splitlines()[0]}")
             else:
-                img = img.convert("P", palette=Image.ADAPTIVE, colors=16, dither=dither)
-                palette = self.get_padded_palette(img)
-            img = self.remap_to_palette(img, palette)
+                self.show_export_preview(*result)
+        if self._preview_shown != self._preview_generation:
+            self.root.after(PREVIEW_POLL_MS, self.poll_preview)
+        else:
+            self._preview_polling = False
+
+    def flush_preview(self):
+        # Make sure _export_img matches the current controls, rendering inline if needed
+        if self.image is None or self._preview_shown == self._preview_generation:
+            return
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+            self._preview_after = None
+        self.preview_worker.cancel(self._preview_generation)
+        self._preview_shown = self._preview_generation
+        self.show_export_preview(*self.render_preview(self.image, self.image_key, self.preview_settings()))
+
+    def export_render(self):
+        # (image, palette) to save: the preview's, or rendered now when the dither
+        # method is export-only and the preview used its stand-in
+        self.flush_preview()
+        settings = self.preview_settings(export=True)
+        if self.image is not None and settings["dither"] in aqp_dither.EXPORT_ONLY_METHODS:
+            img, palette, _ = self.render_preview(self.image, self.image_key, settings)
+            return img, palette
+        return getattr(self, '_export_img', None), getattr(self, '_export_palette', None)
+
+    def show_export_preview(self, img, palette, preview):
         self.set_export_image(img, palette)
         # Show processed image in export preview
-        preview = img.copy()
-        preview = preview.resize((480, 300), Image.NEAREST)
         self.proc_img_preview = ImageTk.PhotoImage(preview)
         self.proc_img_label.config(image=self.proc_img_preview, text="")
         self.update_palette_preview()
 
     def scale_letterbox(self, img, target_size, resample):
-        img_ratio = img.width / img.height
-        target_ratio = target_size[0] / target_size[1]
-        if img_ratio > target_ratio:
-            new_width = target_size[0]
-            new_height = int(new_width / img_ratio)
-        else:
-            new_height = target_size[1]
-            new_width = int(new_height * img_ratio)
-        img = img.resize((new_width, new_height), resample)
-        result = Image.new("RGB", target_size, (0, 0, 0))
-        x = (target_size[0] - new_width) // 2
-        y = (target_size[1] - new_height) // 2
-        result.paste(img, (x, y))
-        return result
+        return aqp_pipeline.scale_letterbox(img, target_size, resample)
 
     def scale_to_fill(self, img, target_size, resample):
-        img_ratio = img.width / img.height
-        target_ratio = target_size[0] / target_size[1]
-        if img_ratio < target_ratio:
-            scale = target_size[0] / img.width
-        else:
-            scale = target_size[1] / img.height
-        new_size = (int(img.width * scale), int(img.height * scale))
-        img = img.resize(new_size, resample)
-        x = (new_size[0] - target_size[0]) // 2
-        y = (new_size[1] - target_size[1]) // 2
-        img = img.crop((x, y, x + target_size[0], y + target_size[1]))
-        return img
+        return aqp_pipeline.scale_to_fill(img, target_size, resample)
 
     def show_preview(self, img):
         preview = img.copy()
@@ -466,6 +459,7 @@ class AQPStudio:
         if self.image is None:
             messagebox.showerror("Error", "No image loaded.")
             return
+        self.flush_preview()
         export_type = self.export_format_var.get()
         with open("error_log.txt", "a") as f:
             f.write(f"[DEBUG] export_type: {export_type}\n")
@@ -477,74 +471,83 @@ class AQPStudio:
             self.export_png()
         else:
             messagebox.showerror("Error", "Unknown export type.")
+    def export_frames(self):
+        # Every frame of the imported animation with one shared palette, as numbered files
+        if not self.frames_path:
+            return
+        settings = self.preview_settings(export=True)
+        if settings["export_fmt"] not in ("BMP4", "BMP1"):
+            messagebox.showerror("Error", "Frame export needs the BMP4 or BMP1 file format.")
+            return
+        out_dir = filedialog.askdirectory(title="Folder for the exported frames")
+        if not out_dir:
+            return
+        self.root.config(cursor="watch")
+        self.root.update_idletasks()
+        try:
+            frames = aqp_anim.load_frames(self.frames_path)
+            encoded, _ = aqp_anim.convert_frames(frames, settings, settings["palette"], os.cpu_count() or 1)
+            name = os.path.splitext(os.path.basename(self.frames_path))[0]
+            paths = aqp_anim.write_frames(encoded, out_dir, name, settings["export_fmt"])
+            messagebox.showinfo("Export Frames", f"Saved {len(paths)} frames to {out_dir}")
+        except Exception as e:
+            import traceback
+            tb = traceback.format_exc()
+            with open("error_log.txt", "w") as f:
+                f.write(f"Failed to export frames: {e}\n\n{tb}")
+            messagebox.showerror("Error", f"Failed to export frames: {e}\nSee error_log.txt for details.")
+        finally:
+            self.root.config(cursor="")
+
+    def export_tiles(self):
+        # The export preview as a deduplicated tileset + tilemap (see aqp_tiles)
+        if self.image is None:
+            messagebox.showerror("Error", "No image loaded.")
+            return
+        img, palette = self.export_render()
+        if img is None or palette is None:
+            messagebox.showerror("Error", "No export image available. Please preview first.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=aqp_tiles.TILESET_EXTENSION, filetypes=[("Aquarius+ Tileset", "*" + aqp_tiles.TILESET_EXTENSION)])
+        if not file_path:
+            return
+        try:
+            # BMP4 pixels are double width; tiles are drawn at 320 across
+            indices = aqp_tiles.image_indices(img, double_width=img.width == aqp_formats.BMP4_SIZE[0])
+            tileset, numbers, flags = aqp_tiles.build_tiles(indices)
+            out_dir, name = os.path.split(os.path.splitext(file_path)[0])
+            aqp_tiles.write_tiles(out_dir, name, tileset, numbers, flags)
+            aqp_palette.write_jasc_palette(os.path.join(out_dir, name + ".pal"), palette)
+            messagebox.showinfo("Export Tiles", aqp_tiles.tiles_report(tileset, numbers, flags))
+        except Exception as e:
+            import traceback
+            tb = traceback.format_exc()
+            with open("error_log.txt", "w") as f:
+                f.write(f"Failed to export tiles: {e}\n\n{tb}")
+            messagebox.showerror("Error", f"Failed to export tiles: {e}\nSee error_log.txt for details.")
+
     def export_bmp1(self):
 
-        # Use processed export preview image and palette
-        img = getattr(self, '_export_img', None)
-        palette = getattr(self, '_export_palette', None)
+        # Use the processed export image and palette
+        img, palette = self.export_render()
         if img is None or palette is None:
             messagebox.showerror("Error", "No export image available. Please preview first.")
             return
-        img.putpalette([v for rgb in palette for v in rgb] + [0]*(768-3*len(palette)))
-
-        # Cell color info: 8x8 cells, each cell has 2 color indices (foreground/background)
-        cell_colors = []
-        pixels = img.load()
-        for cell_y in range(0, 200, 8):
-            for cell_x in range(0, 320, 8):
-                # Get all pixel color indices in cell
-                cell_indices = [pixels[x, y] for y in range(cell_y, cell_y+8) for x in range(cell_x, cell_x+8)]
-                # Find two most common colors in cell
-                from collections import Counter
-                common = Counter(cell_indices).most_common(2)
-                fg = common[0][0] if len(common) > 0 else 0
-                bg = common[1][0] if len(common) > 1 else fg
-                cell_colors.append((fg, bg))
-
-        # Store cell color info: each cell 1 byte (high nibble fg, low nibble bg)
-        cell_bytes = bytearray()
-        for fg, bg in cell_colors:
-            cell_bytes.append(((fg & 0x0F) << 4) | (bg & 0x0F))
-
-        # Pixel data: 320x200, 1BPP, each bit is fg/bg for cell
-        pixel_bytes = bytearray()
-        for y in range(200):
-            for x in range(0, 320, 8):
-                byte = 0
-                for bit in range(8):
-                    cell_x = (x + bit) // 8
-                    cell_y = y // 8
-                    cell_idx = cell_y * 40 + cell_x
-                    fg, bg = cell_colors[cell_idx]
-                    color = pixels[x + bit, y]
-                    byte = (byte << 1) | (1 if color == fg else 0)
-                pixel_bytes.append(byte)
-
-        # Palette: 16 colors, 2 bytes each (Aquarius+ format)
-        palette_bytes = bytearray()
-        for rgb in palette:
-            # Convert 8-bit RGB to Aquarius+ 4:4:4 format
-            r = (rgb[0] // 17) & 0x0F
-            g = (rgb[1] // 17) & 0x0F
-            b = (rgb[2] // 17) & 0x0F
-            palette_bytes.extend([ (g << 4) | b, (0 << 4) | r ])
-
-        # Combine bitmap, cell color info, and palette (BMP1/BM1 order)
-        out_bytes = pixel_bytes + cell_bytes + palette_bytes
+        out_bytes = aqp_formats.encode_bmp1(img, palette)
 
         # Save file
-        file_path = filedialog.asksaveasfilename(defaultextension=".bmp1", filetypes=[("Aquarius+ BMP1", "*.bmp1;*.bm1")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".bmp1", filetypes=[("Aquarius+ BMP1", "*.bmp1;*.bm1"), ("BMP1, LZ compressed", "*.lz"), ("BMP1, RLE compressed", "*.rle")])
         if not file_path:
             return
         try:
             with open(file_path, "wb") as f:
-                f.write(out_bytes)
+                f.write(self.compress_for_path(out_bytes, file_path))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save BMP1: {e}")
 
     def export_png(self):
         # Export the processed image as PNG
-        img = getattr(self, '_export_img', None)
+        img, _ = self.export_render()
         if img is None:
             messagebox.showerror("Error", "No export image available. Please preview first.")
             return
@@ -559,51 +562,36 @@ class AQPStudio:
 
     def export_bmp4(self):
         # Prepare image: 160x200, 16 colors, double-wide pixels
-        img = getattr(self, '_export_img', None)
-        palette = getattr(self, '_export_palette', None)
+        img, palette = self.export_render()
         if img is None or palette is None:
             messagebox.showerror("Error", "No export image available. Please preview first.")
             return
-        pal_bytes = []
-        for rgb in palette:
-            pal_bytes.extend(rgb)
-        img.putpalette(pal_bytes + [0]*(768-len(pal_bytes)))
-        palette_bytes = bytearray()
-        for rgb in palette:
-            r = (rgb[0] >> 4) & 0x0F
-            g = (rgb[1] >> 4) & 0x0F
-            b = (rgb[2] >> 4) & 0x0F
-            palette_bytes.extend([ (g << 4) | b, (0 << 4) | r ])
-        # Pixel data: 160x200, each pixel is 4 bits (nybble)
-        pixel_bytes = bytearray()
-        pixels = img.load()
-        for y in range(200):
-            for x in range(0, 160, 2):
-                p1 = pixels[x, y] & 0x0F
-                p2 = pixels[x+1, y] & 0x0F
-                byte = (p1 << 4) | p2
-                pixel_bytes.append(byte)
-        # Ensure pixel data is exactly 16,000 bytes
-        if len(pixel_bytes) > 16000:
-            pixel_bytes = pixel_bytes[:16000]
-        elif len(pixel_bytes) < 16000:
-            pixel_bytes += bytearray([0] * (16000 - len(pixel_bytes)))
-        # Combine pixel data and palette
-        out_bytes = pixel_bytes + palette_bytes
+        # Pixel data: 160x200, each pixel is 4 bits (nybble), then the palette
+        out_bytes = aqp_formats.encode_bmp4(img, palette)
         # Save file
-        file_path = filedialog.asksaveasfilename(defaultextension=".bmp4", filetypes=[("Aquarius+ BMP4", "*.bmp4;*.bm4")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".bmp4", filetypes=[("Aquarius+ BMP4", "*.bmp4;*.bm4"), ("BMP4, LZ compressed", "*.lz"), ("BMP4, RLE compressed", "*.rle")])
         if not file_path:
             return
         try:
             with open(file_path, "wb") as f:
-                f.write(out_bytes)
+                f.write(self.compress_for_path(out_bytes, file_path))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save BMP4: {e}")
 
+    def compress_for_path(self, data, file_path):
+        # .lz / .rle file names get the compressed variant (see aqp_compress)
+        method = aqp_compress.method_for_path(file_path)
+        if method is None:
+            return data
+        packed = aqp_compress.compress(data, method)
+        messagebox.showinfo("Compressed Export", aqp_compress.compression_report(data, packed, method))
+        return packed
+
     def update_palette_preview(self):
         # Determine which palette to show
         if self.force_palette_var.get() and self.loaded_palette:
-            palette = list(self.loaded_palette)[:16]
+            # Snapped, so swatches and saved files match what the export uses
+            palette = aqp_palette.snap_palette(list(self.loaded_palette)[:16])
             while len(palette) < 16:
                 palette.append((0,0,0))
         else:
@@ -616,7 +604,7 @@ class AQPStudio:
         swatch_width = 6   # tkinter Label width is in text characters
         for i, (swatch, label) in enumerate(self.palette_preview_labels):
             r, g, b = palette[i]
-            r4, g4, b4 = r >> 4, g >> 4, b >> 4
+            r4, g4, b4 = (int(v) for v in aqp_palette.rgb444_levels((r, g, b))[0])
             hex_color = f'#{r:02x}{g:02x}{b:02x}'
             hex_nybble = f'{r4:X}{g4:X}{b4:X}'
             swatch.config(bg=hex_color, width=swatch_width, height=swatch_height)
@@ -629,25 +617,12 @@ class AQPStudio:
 
     def remap_to_palette(self, img, palette):
         # Remap image colors to the given palette (list of 16 RGB tuples)
-        import numpy as np
-        img = img.convert('RGB')
-        arr = np.array(img)
-        h, w, _ = arr.shape
-        pal_arr = np.array(palette)
-        # Flatten image array for fast processing
-        arr_flat = arr.reshape(-1, 3)
-        # Find closest palette color for each pixel
-        def closest_color(pixel):
-            diffs = pal_arr - pixel
-            dist = np.sum(diffs * diffs, axis=1)
-            return np.argmin(dist)
-        idxs = np.array([closest_color(px) for px in arr_flat], dtype=np.uint8)
-        pal_img = Image.new('P', (w, h))
-        pal_img.putpalette([v for rgb in palette for v in rgb] + [0]*(768-3*len(palette)))
-        pal_img.putdata(idxs.reshape(-1))
-        return pal_img
+        return aqp_palette.remap_to_palette(img, palette)
 
 if __name__ == "__main__":
+    # Needed for the batch worker pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
     root = tk.Tk()
     # Set custom window/taskbar icon
     try:
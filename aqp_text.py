@@ -0,0 +1,170 @@
+import numpy as np
+
+import aqp_color
+from aqp_palette import indices_to_image
+from aqp_resources import resource_path
+
+# Aquarius+ text screens: 40 or 80 columns by 25 rows of 8x8 characters, each
+# with its own fg/bg color pair (high nibble fg, low nibble bg).
+#
+#   SCR   character page, then color page; each page is the 40x25 or 80x25
+#         grid in row order, zero padded to 1024 (40 columns) or 2048 bytes
+#
+# Charsets are 256 glyphs of 8 bytes, one byte per pixel row, leftmost pixel
+# in the high bit (assets/aquascii.bin, or custom .chr files).
+TEXT_COLUMNS = [40, 80]
+TEXT_ROWS = 25
+PAGE_BYTES = {40: 1024, 80: 2048}
+CHARSET_BYTES = 2048
+SCR_EXTENSIONS = [".scr", ".scrn"]
+CHARSET_EXTENSIONS = [".bin", ".chr"]
+DEFAULT_CHARSET = resource_path("assets/aquascii.bin")
+# Default Aquarius+ text palette, as 4-bit levels
+DEFAULT_PALETTE = [(r * 17, g * 17, b * 17) for r, g, b in [
+    (0x1, 0x1, 0x1), (0xF, 0x1, 0x1), (0x1, 0xF, 0x1), (0xF, 0xF, 0x1),
+    (0x2, 0x2, 0xE), (0xF, 0x1, 0xF), (0x3, 0xC, 0xC), (0xF, 0xF, 0xF),
+    (0xC, 0xC, 0xC), (0x3, 0xB, 0xB), (0xC, 0x2, 0xC), (0x4, 0x1, 0x9),
+    (0xF, 0xF, 0x7), (0x2, 0xD, 0x4), (0xB, 0x2, 0x2), (0x3, 0x3, 0x3)]]
+# Cells matched per batch, so the (cells, 256, 16) cost tensor stays small
+MATCH_BATCH_CELLS = 500
+
+
+def screen_size(columns):
+    # Pixel size of a text screen image
+    if columns not in PAGE_BYTES:
+        raise ValueError(f"Text screens are 40 or 80 columns, not {columns}")
+    return columns * 8, TEXT_ROWS * 8
+
+
+def parse_charset(data):
+    # 2048 bytes -> (256, 8, 8) bool glyph table
+    if len(data) < CHARSET_BYTES:
+        raise ValueError(f"Charset must be {CHARSET_BYTES} bytes")
+    rows = np.frombuffer(data, dtype=np.uint8, count=CHARSET_BYTES).reshape(256, 8)
+    return np.unpackbits(rows, axis=1).reshape(256, 8, 8).astype(bool)
+
+
+def load_charset(file_path=DEFAULT_CHARSET):
+    with open(file_path, "rb") as f:
+        return parse_charset(f.read())
+
+
+def screen_columns(data):
+    # 40 or 80 columns, from the size of an SCR file
+    for columns, page in PAGE_BYTES.items():
+        if len(data) == page * 2:
+            return columns
+    raise ValueError(f"Not an SCR text screen ({len(data)} bytes)")
+
+
+def screen_cells(rgb, columns):
+    # (rows * columns, 64, 3) pixels, one row of 64 per 8x8 cell in screen order
+    w, h = screen_size(columns)
+    arr = np.asarray(rgb)
+    if arr.shape[:2] != (h, w):
+        raise ValueError(f"{columns}-column text screens must be {w}x{h}")
+    return arr.reshape(TEXT_ROWS, 8, columns, 8, 3).swapaxes(1, 2).reshape(TEXT_ROWS * columns, 64, 3)
+
+
+def pixel_errors(cells, palette, metric="rgb"):
+    # Error of every pixel against every palette color: (cells, 64, 16) float32
+    if metric != "rgb":
+        return aqp_color.distance_table(palette, metric)[aqp_color.rgb444_index(cells)]
+    cells = cells.astype(np.float32)
+    pal = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+    return (cells * cells).sum(axis=2)[:, :, None] - 2 * (cells @ pal.T) + (pal * pal).sum(axis=1)
+
+
+def match_glyphs(err, glyphs):
+    # Best (char, fg, bg) for every cell, searched over all glyphs and color pairs.
+    # err is (cells, 64, n), glyphs is (256, 8, 8) bool. For one glyph the cost of
+    # a pair splits into fg error on set pixels plus bg error on clear pixels:
+    #   on[c, g, f] = sum_p G[g, p] * err[c, p, f]       (one batched matmul)
+    #   cost[c, g]  = min_f on[c, g, f] + min_b (total[c, b] - on[c, g, b])
+    # so fg and bg are picked independently and no (256, n, n) tensor is needed.
+    # Glyphs are tried in order of set pixels, so flat cells get a space.
+    bits = glyphs.reshape(len(glyphs), 64)
+    order = np.argsort(bits.sum(axis=1), kind="stable")
+    g = bits[order].astype(np.float32)
+    chars = np.empty(len(err), dtype=np.uint8)
+    fg = np.empty(len(err), dtype=np.uint8)
+    bg = np.empty(len(err), dtype=np.uint8)
+    for start in range(0, len(err), MATCH_BATCH_CELLS):
+        e = np.asarray(err[start:start + MATCH_BATCH_CELLS], dtype=np.float32)
+        on = g @ e  # (cells, glyphs, n)
+        off = e.sum(axis=1)[:, None, :] - on
+        cost = on.min(axis=2) + off.min(axis=2)
+        best = np.argmin(cost, axis=1)
+        rows = np.arange(len(e))
+        stop = start + len(e)
+        chars[start:stop] = order[best]
+        fg[start:stop] = np.argmin(on[rows, best], axis=1)
+        bg[start:stop] = np.argmin(off[rows, best], axis=1)
+    return chars, fg, bg
+
+
+def encode_text(rgb, glyphs, palette=DEFAULT_PALETTE, columns=40, metric="rgb"):
+    # 320x200 or 640x200 RGB array -> (chars, fg, bg), each (25, columns) uint8
+    err = pixel_errors(screen_cells(rgb, columns), palette, metric)
+    chars, fg, bg = match_glyphs(err, glyphs)
+    shape = (TEXT_ROWS, columns)
+    return chars.reshape(shape), fg.reshape(shape), bg.reshape(shape)
+
+
+def pack_scr(chars, fg, bg):
+    # Character page then color page, each zero padded
+    chars = np.asarray(chars, dtype=np.uint8)
+    columns = chars.shape[1]
+    page = PAGE_BYTES[columns]
+    colors = ((np.asarray(fg, dtype=np.uint8) & 0x0F) << 4) | (np.asarray(bg, dtype=np.uint8) & 0x0F)
+    out = bytearray(page * 2)
+    out[:chars.size] = chars.tobytes()
+    out[page:page + colors.size] = colors.tobytes()
+    return bytes(out)
+
+
+def image_to_scr(img, glyphs, palette=DEFAULT_PALETTE, columns=40, metric="rgb"):
+    # PIL image already at screen size -> SCR bytes
+    rgb = np.asarray(img.convert("RGB"))
+    return pack_scr(*encode_text(rgb, glyphs, palette, columns, metric))
+
+
+def unpack_scr(data, columns=None):
+    # SCR bytes -> (chars, fg, bg), each (25, columns) uint8
+    columns = columns or screen_columns(data)
+    page = PAGE_BYTES[columns]
+    if len(data) < page * 2:
+        raise ValueError(f"File too small to be a {columns}-column SCR screen")
+    cells = TEXT_ROWS * columns
+    chars = np.frombuffer(data, dtype=np.uint8, count=cells).reshape(TEXT_ROWS, columns)
+    colors = np.frombuffer(data, dtype=np.uint8, count=cells, offset=page).reshape(TEXT_ROWS, columns)
+    return chars, colors >> 4, colors & 0x0F
+
+
+def render_indices(chars, fg, bg, glyphs):
+    # Palette indices of a whole screen: one gather of the glyph bits for every
+    # cell, then bg ^ (bit * (fg ^ bg)) as in aqp_formats.decode_bmp1
+    rows, columns = chars.shape
+    bits = glyphs[chars]  # (rows, columns, 8, 8)
+    fg = fg[:, :, None, None]
+    bg = bg[:, :, None, None]
+    indices = (bits * (fg ^ bg)) ^ bg
+    return np.ascontiguousarray(indices.swapaxes(1, 2)).reshape(rows * 8, columns * 8)
+
+
+def render_scr(data, glyphs, palette=DEFAULT_PALETTE, columns=None):
+    # SCR bytes -> P-mode image of 320x200 or 640x200
+    return indices_to_image(render_indices(*unpack_scr(data, columns), glyphs), palette)
+
+
+def decode_scr(data, glyphs=None, palette=DEFAULT_PALETTE):
+    # SCR bytes -> (indices, palette), like aqp_formats.decode_bmp4; AQUASCII by default
+    if glyphs is None:
+        glyphs = load_charset()
+    return render_indices(*unpack_scr(data), glyphs), list(palette)
+
+
+def load_scr(file_path, charset=DEFAULT_CHARSET, palette=DEFAULT_PALETTE):
+    with open(file_path, "rb") as f:
+        data = f.read()
+    return render_scr(data, load_charset(charset), palette)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+import aqp_pipeline
+
+# Thumbnails for the gallery, decoded on a thread pool and kept in an on-disk
+# cache keyed by path + mtime + size, so reopening a folder only reads small PNGs.
+# Finished thumbnails go to a queue that the Tk main loop drains; PhotoImages are
+# made there, never on the worker threads.
+THUMB_SIZE = (160, 100)
+THUMB_VERSION = 1  # Bump when thumbnails change so old cache entries are ignored
+THUMB_WORKERS = 4
+# Thumbnails kept in memory, least recently used dropped first (~48 KB each)
+THUMB_MEMORY_ENTRIES = 512
+
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "aqp-studio", "thumbs")
+
+
+def list_images(directory):
+    # Image files directly inside directory, sorted case-insensitively
+    names = [n for n in os.listdir(directory) if os.path.splitext(n)[1].lower() in aqp_pipeline.IMAGE_EXTENSIONS]
+    return [os.path.join(directory, n) for n in sorted(names, key=str.lower) if os.path.isfile(os.path.join(directory, n))]
+
+
+def make_thumbnail(file_path, size=THUMB_SIZE):
+    # BMP4/BMP1 and SCR screens are shown at their 320x200 display aspect, like
+    # the preview; other images keep their aspect (JPEGs decode at a reduced DCT scale)
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in aqp_pipeline.BMP4_EXTENSIONS or ext in aqp_pipeline.BMP1_EXTENSIONS or ext in aqp_pipeline.SCR_EXTENSIONS:
+        img, _ = aqp_pipeline.load_image(file_path)
+        return img.convert("RGB").resize(size, Image.NEAREST)
+    with Image.open(file_path) as img:
+        img.draft("RGB", size)
+        img = img.convert("RGB")
+    img.thumbnail(size, Image.BICUBIC)
+    return img
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=None, workers=THUMB_WORKERS, max_entries=THUMB_MEMORY_ENTRIES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_entries = max_entries
+        self.results = queue.Queue()
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbs")
+        self._futures = []
+        self._generation = 0
+
+    def cache_path(self, file_path):
+        st = os.stat(file_path)
+        key = f"{THUMB_VERSION}|{os.path.abspath(file_path)}|{st.st_mtime_ns}|{st.st_size}"
+        return os.path.join(self.cache_dir, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".png")
+
+    def load(self, file_path):
+        # Thumbnail from memory, then disk cache, else decoded and written to the cache
+        cached = self.cache_path(file_path)
+        with self._lock:
+            img = self._memory.get(cached)
+            if img is not None:
+                self._memory.move_to_end(cached)
+        if img is not None:
+            return img
+        try:
+            with Image.open(cached) as f:
+                img = f.convert("RGB")
+        except (OSError, ValueError):
+            img = make_thumbnail(file_path)
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f"{cached}.{threading.get_ident()}.tmp"
+                img.save(tmp, format="PNG")
+                os.replace(tmp, cached)
+            except OSError:
+                pass  # A read-only cache only costs speed
+        with self._lock:
+            self._memory[cached] = img
+            self._memory.move_to_end(cached)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return img
+
+    def request(self, paths):
+        # Queue thumbnails for paths; results arrive as (generation, path, image, error).
+        # Anything still pending from an earlier request is dropped.
+        self.cancel()
+        generation = self._generation
+        self._futures = [self._pool.submit(self._job, generation, path) for path in paths]
+        return generation
+
+    def cancel(self):
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def is_stale(self, generation):
+        return generation != self._generation
+
+    def _job(self, generation, path):
+        if self.is_stale(generation):
+            return
+        try:
+            self.results.put((generation, path, self.load(path), None))
+        except Exception as e:
+            self.results.put((generation, path, None, str(e)))
+
+    def close(self):
+        self.cancel()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,162 @@
+import os
+
+import numpy as np
+
+import aqp_formats
+
+# Tile Tool: cut a palette-indexed image into 8x8 4bpp tiles, merge repeats
+# (including flipped copies) and build the tilemap that redraws it.
+#
+#   tileset  32 bytes per tile, 4 bytes per row, two pixels per byte high
+#            nibble first (the BMP4 packing)
+#   tilemap  64x32 entries of u16, little endian:
+#            bits 0-8 tile, 9 h-flip, 10 v-flip, 12-13 palette, 14 priority
+TILE_SIZE = 8
+TILE_BYTES = 32
+MAX_TILES = 512
+MAP_COLUMNS, MAP_ROWS = 64, 32
+MAP_BYTES = MAP_COLUMNS * MAP_ROWS * 2
+FLIP_H = 1 << 9
+FLIP_V = 1 << 10
+PALETTE_SHIFT = 12
+PRIORITY = 1 << 14
+TILESET_EXTENSION = ".tiles"
+TILEMAP_EXTENSION = ".map"
+# Each packed byte with its two pixels swapped, for flipping packed rows
+SWAP_NIBBLES = np.array([((b & 0x0F) << 4) | (b >> 4) for b in range(256)], dtype=np.uint8)
+
+
+def image_indices(img, double_width=False):
+    # Palette indices of a P image; double_width widens BMP4's 160-pixel rows to
+    # the 320-pixel tile screen
+    indices = np.asarray(img, dtype=np.uint8) & 0x0F
+    if double_width:
+        indices = np.repeat(indices, 2, axis=1)
+    return indices
+
+
+def split_tiles(indices):
+    # (h, w) indices -> (rows, columns, 8, 8), edges padded with index 0
+    h, w = indices.shape
+    rows, columns = -(-h // TILE_SIZE), -(-w // TILE_SIZE)
+    padded = np.zeros((rows * TILE_SIZE, columns * TILE_SIZE), dtype=np.uint8)
+    padded[:h, :w] = indices
+    return padded.reshape(rows, TILE_SIZE, columns, TILE_SIZE).swapaxes(1, 2)
+
+
+def pack_tiles(tiles):
+    # (n, 8, 8) indices -> (n, 32) packed tile bytes
+    tiles = np.asarray(tiles, dtype=np.uint8)
+    return aqp_formats.pack_nibbles(tiles.reshape(-1)).reshape(len(tiles), TILE_BYTES)
+
+
+def unpack_tiles(data):
+    return aqp_formats.unpack_nibbles(bytes(data)).reshape(-1, TILE_SIZE, TILE_SIZE)
+
+
+def flip_variants(packed):
+    # (n, 32) packed tiles -> (n, 4, 32): as is, h-flipped, v-flipped, both.
+    # Works on the packed bytes: h-flip reverses each row's bytes and swaps nibbles.
+    rows = packed.reshape(-1, TILE_SIZE, TILE_BYTES // TILE_SIZE)
+    h = SWAP_NIBBLES[rows[:, :, ::-1]]
+    v = rows[:, ::-1]
+    hv = h[:, ::-1]
+    return np.stack([rows, h, v, hv], axis=1).reshape(-1, 4, TILE_BYTES)
+
+
+def dedup_tiles(packed, flips=True):
+    # Hash index over packed tile bytes. Each new tile registers all its flip
+    # variants, so a later tile that matches any of them reuses it.
+    # Returns (unique packed tiles, tile number per input, flip bits per input).
+    variants = flip_variants(np.asarray(packed, dtype=np.uint8)) if flips else np.asarray(packed, dtype=np.uint8)[:, None]
+    data = variants.tobytes()
+    step = variants.shape[1] * TILE_BYTES
+    index = {}
+    unique = []
+    numbers = np.empty(len(variants), dtype=np.uint16)
+    flags = np.zeros(len(variants), dtype=np.uint8)
+    for i in range(len(variants)):
+        base = i * step
+        key = data[base:base + TILE_BYTES]
+        hit = index.get(key)
+        if hit is None:
+            hit = (len(unique), 0)
+            unique.append(i)
+            # Unflipped first, so symmetric tiles are stored without flip bits
+            for flip in range(variants.shape[1]):
+                index.setdefault(data[base + flip * TILE_BYTES:base + (flip + 1) * TILE_BYTES], (hit[0], flip))
+        numbers[i], flags[i] = hit
+    return variants[unique, 0], numbers, flags
+
+
+def map_entries(numbers, flags, palette=0, priority=False):
+    # Tile numbers and flip bits (bit 0 h, bit 1 v) -> tilemap entries
+    numbers = np.asarray(numbers)
+    if numbers.size and numbers.max() >= MAX_TILES:
+        raise ValueError(f"{int(numbers.max()) + 1} tiles, the tilemap can address {MAX_TILES}")
+    entries = numbers.astype(np.uint16) | (np.asarray(flags, dtype=np.uint16) << 9) | np.uint16((palette & 3) << PALETTE_SHIFT)
+    if priority:
+        entries |= PRIORITY
+    return entries
+
+
+def split_entries(entries):
+    # Tilemap entries -> (tile numbers, flip bits)
+    entries = np.asarray(entries, dtype=np.uint16)
+    return entries & 0x1FF, ((entries >> 9) & 3).astype(np.uint8)
+
+
+def build_tiles(indices, flips=True):
+    # (h, w) palette indices -> (tileset as (n, 32) packed tiles, tile numbers,
+    # flip bits), the last two (rows, columns). The tileset may exceed MAX_TILES;
+    # map_entries refuses those.
+    tiles = split_tiles(indices)
+    rows, columns = tiles.shape[:2]
+    unique, numbers, flags = dedup_tiles(pack_tiles(tiles.reshape(-1, TILE_SIZE, TILE_SIZE)), flips)
+    return unique, numbers.reshape(rows, columns), flags.reshape(rows, columns)
+
+
+def pack_tilemap(entries):
+    # Tilemap entries placed at the top left of the 64x32 map, rest zero
+    entries = np.asarray(entries, dtype=np.uint16)
+    rows, columns = entries.shape
+    if rows > MAP_ROWS or columns > MAP_COLUMNS:
+        raise ValueError(f"Tilemap is {MAP_COLUMNS}x{MAP_ROWS} tiles, image needs {columns}x{rows}")
+    out = np.zeros((MAP_ROWS, MAP_COLUMNS), dtype="<u2")
+    out[:rows, :columns] = entries
+    return out.tobytes()
+
+
+def unpack_tilemap(data):
+    return np.frombuffer(data, dtype="<u2", count=MAP_COLUMNS * MAP_ROWS).reshape(MAP_ROWS, MAP_COLUMNS)
+
+
+def render_tiles(tileset, numbers, flags):
+    # Palette indices drawn from a tileset and a tile map, flips applied
+    tiles = unpack_tiles(np.asarray(tileset, dtype=np.uint8).tobytes())
+    rows, columns = numbers.shape
+    cells = tiles[numbers]
+    h = (flags & 1) != 0
+    v = (flags & 2) != 0
+    cells = np.where(h[:, :, None, None], cells[:, :, :, ::-1], cells)
+    cells = np.where(v[:, :, None, None], cells[:, :, ::-1, :], cells)
+    return np.ascontiguousarray(cells.swapaxes(1, 2)).reshape(rows * TILE_SIZE, columns * TILE_SIZE)
+
+
+def write_tiles(out_dir, name, tileset, numbers, flags, palette=0, priority=False):
+    # <name>.tiles and <name>.map; returns both paths
+    tilemap = pack_tilemap(map_entries(numbers, flags, palette, priority))
+    tiles_path = os.path.join(out_dir, name + TILESET_EXTENSION)
+    map_path = os.path.join(out_dir, name + TILEMAP_EXTENSION)
+    with open(tiles_path, "wb") as f:
+        f.write(np.asarray(tileset, dtype=np.uint8).tobytes())
+    with open(map_path, "wb") as f:
+        f.write(tilemap)
+    return tiles_path, map_path
+
+
+def tiles_report(tileset, numbers, flags):
+    report = f"{numbers.size} tiles -> {len(tileset)} unique ({len(tileset) * TILE_BYTES} bytes), {int((flags != 0).sum())} placed flipped"
+    if len(tileset) > MAX_TILES:
+        report += f", over the {MAX_TILES} tile limit"
+    return report
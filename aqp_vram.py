@@ -0,0 +1,275 @@
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+import aqp_dither
+import aqp_tiles
+from aqp_palette import image_palette, pad_palette, snap_palette
+from aqp_tiles import MAX_TILES, TILE_BYTES, TILE_SIZE
+
+# VRAM planner: packs the tiles of a tilemap image and any number of sprite
+# sheets into the Aquarius+ tile layout and reports what each region uses.
+#
+#   0x0000-0x0FFF  tilemap, 64x32 entries (hides tile patterns 0-127)
+#   0x0000-0x3FFF  tile patterns, 32 bytes each, tile n at n * 32
+#   sprites        64 attribute slots, one per 8x8 sprite on screen
+#   palettes       4 banks of 16 colors, picked per tilemap entry / sprite
+#
+# Sprite pixels with index 0 are transparent, so empty 8x8 parts of a sprite
+# frame take neither a pattern nor a slot. Sheets with an alpha channel keep
+# index 0 for their fully transparent pixels and draw with colors 1-15.
+VRAM_BYTES = 16384
+TILEMAP_TILES = aqp_tiles.MAP_BYTES // TILE_BYTES
+MAX_SPRITES = 64
+PALETTE_BANKS = 4
+ASSET_KINDS = ["tilemap", "sprites"]
+VRAM_EXTENSION = ".vram"
+
+# numbers/flags: asset-local tile number and flip bits per placed tile
+# (-1 marks an empty sprite part); slots: sprite attribute slots needed
+Asset = namedtuple("Asset", "name kind palette tiles numbers flags slots")
+VramPlan = namedtuple("VramPlan", "assets tiles numbers flags banks palettes first_tile merged max_error")
+
+
+def tilemap_asset(name, indices, palette):
+    tiles, numbers, flags = aqp_tiles.build_tiles(indices)
+    return Asset(name, "tilemap", list(palette), aqp_tiles.unpack_tiles(tiles.tobytes()), numbers, flags, 0)
+
+
+def sprite_indices(img, palette=None, dither="floyd", metric="rgb"):
+    # Sprite sheet -> (indices, palette) with fully transparent pixels at index 0
+    # and the visible ones matched to colors 1-15 of the given palette, or of a
+    # 15-color median cut of the visible pixels alone
+    rgba = np.asarray(img.convert("RGBA"))
+    rgb = np.ascontiguousarray(rgba[:, :, :3])
+    visible = rgba[:, :, 3] > 0
+    if palette:
+        palette = snap_palette(pad_palette(palette))
+    elif visible.any():
+        strip = Image.fromarray(rgb[visible][None])
+        colors = image_palette(strip.convert("P", palette=Image.ADAPTIVE, colors=15, dither=Image.NONE))[:15]
+        palette = snap_palette([(0, 0, 0)] + colors)
+    else:
+        palette = pad_palette([])
+    # Transparent pixels hold an exact palette color, so no dither error spreads from them
+    rgb[~visible] = palette[1]
+    indices = aqp_dither.dither(rgb, palette[1:], dither, metric).astype(np.uint8) + 1
+    indices[~visible] = 0
+    return indices, palette
+
+
+def sprite_asset(name, indices, palette, frame_size=(16, 16), instances=1):
+    # Sheet cut into frames of frame_size (multiples of 8), each into 8x8 parts.
+    # One frame per instance is on screen at a time, so the slots needed are the
+    # busiest frame's parts times instances.
+    fw, fh = frame_size
+    if fw % TILE_SIZE or fh % TILE_SIZE:
+        raise ValueError(f"Sprite frames must be multiples of {TILE_SIZE} pixels, not {fw}x{fh}")
+    h, w = indices.shape
+    frames = (indices[:h - h % fh, :w - w % fw]
+              .reshape(h // fh, fh, w // fw, fw).swapaxes(1, 2).reshape(-1, fh, fw))
+    if not len(frames):
+        raise ValueError(f"Sprite sheet is smaller than one {fw}x{fh} frame")
+    parts = frames.reshape(len(frames), fh // TILE_SIZE, TILE_SIZE, fw // TILE_SIZE, TILE_SIZE).swapaxes(2, 3)
+    parts = parts.reshape(len(frames), -1, TILE_SIZE, TILE_SIZE)
+    used = parts.reshape(len(frames), parts.shape[1], -1).any(axis=2)
+    unique, numbers, flags = aqp_tiles.dedup_tiles(aqp_tiles.pack_tiles(parts[used]))
+    all_numbers = np.full(used.shape, -1, dtype=np.int32)
+    all_flags = np.zeros(used.shape, dtype=np.uint8)
+    all_numbers[used] = numbers
+    all_flags[used] = flags
+    slots = int(used.sum(axis=1).max()) * instances
+    return Asset(name, "sprites", list(palette), aqp_tiles.unpack_tiles(unique.tobytes()), all_numbers, all_flags, slots)
+
+
+def assign_banks(assets):
+    # One palette bank per distinct palette, in asset order
+    palettes = []
+    banks = []
+    for asset in assets:
+        key = [tuple(int(v) for v in c) for c in asset.palette[:16]]
+        if key not in palettes:
+            palettes.append(key)
+        banks.append(palettes.index(key))
+    return banks, palettes
+
+
+def tile_colors(tiles, palette):
+    # (n, 8, 8) indices -> (n, 4, 192) float32 RGB of the 4 flip variants
+    variants = np.stack([tiles, tiles[:, :, ::-1], tiles[:, ::-1, :], tiles[:, ::-1, ::-1]], axis=1)
+    pal = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+    return pal[variants].reshape(len(tiles), 4, 64 * 3)
+
+
+def tile_distances(colors):
+    # RMS per-pixel RGB distance from each tile to every other tile's closest
+    # flip variant, as one matmul: (n, n) distances and (n, n) flip bits
+    n = len(colors)
+    a = colors[:, 0]
+    b = colors.reshape(n * 4, -1)
+    sq = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2 * (a @ b.T)
+    sq = np.maximum(sq, 0).reshape(n, n, 4)
+    flips = np.argmin(sq, axis=2).astype(np.uint8)
+    dist = np.sqrt(np.take_along_axis(sq, flips[:, :, None], axis=2)[:, :, 0] / 64)
+    np.fill_diagonal(dist, np.inf)
+    return dist, flips
+
+
+def merge_tiles(dist, flips, usage, target_count, threshold):
+    # Greedy merging of near-duplicates: repeatedly fold the tile whose merge
+    # costs least (distance times how often it is placed) into its nearest
+    # neighbour, until target_count tiles remain or nothing is within threshold.
+    # A tile that absorbs another is kept as is, so errors never chain.
+    # Returns (target per tile, flip per tile, merges done, largest distance used).
+    n = len(dist)
+    target = np.arange(n)
+    flip = np.zeros(n, dtype=np.uint8)
+    dist = dist.copy()
+    nearest = np.argmin(dist, axis=1)
+    best = dist[np.arange(n), nearest]
+    count = n
+    merged = 0
+    max_error = 0.0
+    while count > target_count:
+        cost = np.where(best <= threshold, best * usage, np.inf)
+        i = int(np.argmin(cost))
+        if not np.isfinite(cost[i]):
+            break
+        j = int(nearest[i])
+        target[i] = j
+        flip[i] = flips[i, j]
+        max_error = max(max_error, float(best[i]))
+        merged += 1
+        count -= 1
+        # i is gone and j is frozen: neither merges away, nothing merges into i
+        dist[i, :] = np.inf
+        dist[j, :] = np.inf
+        dist[:, i] = np.inf
+        best[i] = best[j] = np.inf
+        stale = np.flatnonzero((nearest == i) & np.isfinite(best))
+        if len(stale):
+            nearest[stale] = np.argmin(dist[stale], axis=1)
+            best[stale] = dist[stale, nearest[stale]]
+    return target, flip, merged, max_error
+
+
+def plan_vram(assets, threshold=0.0, budget=None):
+    # Packs every asset's tiles into one pattern pool. Exact (and flipped)
+    # repeats across assets with the same palette are shared; if the pool is
+    # still over budget (default: every pattern not under the tilemap), tiles
+    # within threshold RMS error are merged.
+    maps = sum(asset.kind == "tilemap" for asset in assets)
+    if maps > 1:
+        raise ValueError(f"VRAM holds one tilemap, got {maps}")
+    banks, palettes = assign_banks(assets)
+    has_map = maps > 0
+    first_tile = TILEMAP_TILES if has_map else 0
+    if budget is None:
+        budget = MAX_TILES - first_tile
+    # Exact dedup per palette bank, over all assets sharing it
+    pool_tiles, pool_bank = [], []
+    local_maps = []  # per asset: (pool number, flip) for each asset-local tile
+    for bank in range(len(palettes)):
+        members = [k for k, b in enumerate(banks) if b == bank]
+        tiles = np.concatenate([assets[k].tiles for k in members])
+        unique, numbers, flags = aqp_tiles.dedup_tiles(aqp_tiles.pack_tiles(tiles))
+        offset = sum(len(t) for t in pool_tiles)
+        pool_tiles.append(aqp_tiles.unpack_tiles(unique.tobytes()))
+        pool_bank.append(np.full(len(unique), bank))
+        start = 0
+        for k in members:
+            n = len(assets[k].tiles)
+            local_maps.append((k, numbers[start:start + n].astype(np.int64) + offset, flags[start:start + n]))
+            start += n
+    tiles = np.concatenate(pool_tiles) if pool_tiles else np.zeros((0, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    bank_of = np.concatenate(pool_bank) if pool_bank else np.zeros(0, dtype=np.int64)
+    local_maps = {k: (numbers, flags) for k, numbers, flags in local_maps}
+    # How often each pool tile is placed, for weighting merges
+    usage = np.zeros(len(tiles))
+    for k, asset in enumerate(assets):
+        placed = asset.numbers[asset.numbers >= 0]
+        np.add.at(usage, local_maps[k][0][placed], 1)
+    # Near-duplicate merging, with distances only between tiles of the same bank
+    n = len(tiles)
+    target, flip, merged, max_error = np.arange(n), np.zeros(n, dtype=np.uint8), 0, 0.0
+    if n > budget and threshold > 0:
+        dist = np.full((n, n), np.inf, dtype=np.float32)
+        flips = np.zeros((n, n), dtype=np.uint8)
+        for bank, palette in enumerate(palettes):
+            idx = np.flatnonzero(bank_of == bank)
+            d, f = tile_distances(tile_colors(tiles[idx], palette))
+            dist[np.ix_(idx, idx)] = d
+            flips[np.ix_(idx, idx)] = f
+        target, flip, merged, max_error = merge_tiles(dist, flips, np.maximum(usage, 1), budget, threshold)
+    keep = np.flatnonzero(target == np.arange(n))
+    renumber = np.full(n, -1, dtype=np.int64)
+    renumber[keep] = np.arange(len(keep)) + first_tile
+    final_number = renumber[target]
+    # Remap every placed tile: asset-local -> pool -> merged, composing flips
+    numbers, flags = [], []
+    for k, asset in enumerate(assets):
+        pool_number, pool_flip = local_maps[k]
+        placed = asset.numbers >= 0
+        local = np.where(placed, asset.numbers, 0)
+        pooled = pool_number[local]
+        number = np.where(placed, final_number[pooled], -1)
+        flag = asset.flags ^ pool_flip[local] ^ flip[pooled]
+        numbers.append(number)
+        flags.append(np.where(placed, flag, 0).astype(np.uint8))
+    return VramPlan(assets, tiles[keep], numbers, flags, banks, palettes, first_tile, merged, max_error)
+
+
+def plan_regions(plan):
+    # (region, used, capacity, unit) rows for the report
+    sizes = [numbers.shape for asset, numbers in zip(plan.assets, plan.numbers) if asset.kind == "tilemap"]
+    rows, columns = sizes[0] if sizes else (0, 0)
+    tiles = len(plan.tiles)
+    return [
+        ("tilemap", aqp_tiles.MAP_BYTES if sizes else 0, aqp_tiles.MAP_BYTES, "bytes"),
+        ("tilemap columns", columns, aqp_tiles.MAP_COLUMNS, "tiles"),
+        ("tilemap rows", rows, aqp_tiles.MAP_ROWS, "tiles"),
+        ("tile patterns", tiles * TILE_BYTES, (MAX_TILES - plan.first_tile) * TILE_BYTES, "bytes"),
+        ("sprite attributes", sum(a.slots for a in plan.assets), MAX_SPRITES, "slots"),
+        ("palettes", len(plan.palettes), PALETTE_BANKS, "banks"),
+    ]
+
+
+def plan_fits(plan):
+    return all(used <= capacity for _, used, capacity, _ in plan_regions(plan))
+
+
+def plan_report(plan):
+    lines = []
+    for region, used, capacity, unit in plan_regions(plan):
+        flag = "" if used <= capacity else "  OVER"
+        lines.append(f"{region:18} {used:6} / {capacity:6} {unit}{flag}")
+    last = plan.first_tile + len(plan.tiles) - 1
+    lines.append(f"tiles {plan.first_tile}-{last} at 0x{plan.first_tile * TILE_BYTES:04X}-0x{(last + 1) * TILE_BYTES - 1:04X}"
+                 if len(plan.tiles) else "no tiles")
+    if plan.merged:
+        lines.append(f"merged {plan.merged} near-duplicate tiles (largest RMS error {plan.max_error:.1f})")
+    lines.append("fits" if plan_fits(plan) else "does not fit")
+    return "\n".join(lines)
+
+
+def tile_indices(plan, asset_index):
+    # Rendered palette indices of a tilemap asset as planned, for checking merges
+    numbers = plan.numbers[asset_index] - plan.first_tile
+    packed = aqp_tiles.pack_tiles(plan.tiles)
+    return aqp_tiles.render_tiles(packed, numbers, plan.flags[asset_index])
+
+
+def vram_image(plan):
+    # 16 KB VRAM contents: the tilemap at 0, patterns at their tile numbers
+    if not plan_fits(plan):
+        raise ValueError("Plan does not fit in VRAM")
+    out = bytearray(VRAM_BYTES)
+    start = plan.first_tile * TILE_BYTES
+    patterns = aqp_tiles.pack_tiles(plan.tiles).tobytes()
+    out[start:start + len(patterns)] = patterns
+    for k, asset in enumerate(plan.assets):
+        if asset.kind == "tilemap":
+            entries = aqp_tiles.map_entries(plan.numbers[k], plan.flags[k], plan.banks[k])
+            out[:aqp_tiles.MAP_BYTES] = aqp_tiles.pack_tilemap(entries)
+    return bytes(out)
@@ -0,0 +1,173 @@
+# Stage timings for the import -> preview -> export pipeline, headless.
+# Usage:
+#   python benchmarks/bench_pipeline.py                          compare against baseline.json (exit code 1 on regressions)
+#   python benchmarks/bench_pipeline.py --baseline bench.json    compare against another --save
+#   python benchmarks/bench_pipeline.py --no-baseline --save bench.json
+# benchmarks/baseline.json is committed; its "meta" records the machine it was
+# timed on. Timings only compare on similar hardware, so re-save it (--save
+# benchmarks/baseline.json) when the reference machine changes.
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import aqp_formats
+import aqp_palette
+import aqp_pipeline
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample_images")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PHOTO_SIZE = (3840, 2160)
+
+
+def timed(func, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - t0) * 1000)
+    return result, {"median_ms": statistics.median(times), "min_ms": min(times), "runs": repeat}
+
+
+def synthetic_photo(path, seed):
+    # Smooth gradients plus texture and noise, roughly photo-like for quantizers and JPEG
+    w, h = PHOTO_SIZE
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, 3)
+    channels = []
+    for c in range(3):
+        v = 128 + 90 * np.sin(x / (300 + 80 * c) + phase[c]) * np.cos(y / (250 + 60 * c) - phase[c])
+        v += 30 * np.sin((x + y) / 37.0 + c)
+        channels.append(v)
+    arr = np.stack(channels, axis=-1) + rng.normal(0, 8, (h, w, 3))
+    Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(path, quality=90)
+
+
+def bench_file(name, data_loader, repeat, results):
+    def record(stage, func):
+        result, stats = timed(func, repeat)
+        results[f"{stage}/{name}"] = stats
+        return result
+
+    img = data_loader(record)
+    rgb = img.convert("RGB")
+    for export_fmt in ("BMP4", "BMP1"):
+        size = aqp_pipeline.target_size(export_fmt)
+        tag = export_fmt.lower()
+        record(f"scale_letterbox_{tag}", lambda: aqp_pipeline.scale_letterbox(rgb, size, Image.BICUBIC))
+        scaled = record(f"scale_to_fill_{tag}", lambda: aqp_pipeline.scale_to_fill(rgb, size, Image.BICUBIC))
+        quantized = record(f"adaptive_quantize_{tag}", lambda: scaled.convert("P", palette=Image.ADAPTIVE, colors=16, dither=Image.FLOYDSTEINBERG))
+        palette = aqp_palette.image_palette(quantized)
+        record(f"remap_adaptive_{tag}", lambda: aqp_palette.remap_to_palette(quantized, palette))
+        remapped = record(f"remap_to_palette_{tag}", lambda: aqp_palette.remap_to_palette(scaled, palette))
+        if export_fmt == "BMP4":
+            record("export_bmp4", lambda: aqp_formats.encode_bmp4(remapped, palette))
+        else:
+            record("export_bmp1", lambda: aqp_formats.encode_bmp1(remapped, palette))
+        record(f"preview_upscale_{tag}", lambda: remapped.resize((480, 300), Image.NEAREST))
+
+
+def run(repeat, photos, sample_dir):
+    results = {}
+    paths = sorted(glob.glob(os.path.join(sample_dir, "*")))
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in (".bmp4", ".bmp1"):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        stage = "import_" + ext[1:]
+        decode = aqp_formats.decode_bmp4 if ext == ".bmp4" else aqp_formats.decode_bmp1
+
+        def loader(record, data=data, decode=decode, stage=stage):
+            indices, palette = record(stage, lambda: decode(data))
+            return aqp_palette.indices_to_image(indices, palette)
+        bench_file(os.path.basename(path), loader, repeat, results)
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(photos):
+            path = os.path.join(tmp, f"photo{i}.jpg")
+            synthetic_photo(path, seed=i)
+
+            def loader(record, path=path):
+                def load():
+                    img = Image.open(path)
+                    img.load()
+                    return img
+                return record("import_jpeg", load)
+            bench_file(f"photo{i}_4k.jpg", loader, repeat, results)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    # Regression when the best run is both relatively and absolutely slower than the
+    # baseline's best run; min is far less noisy than the median on a busy machine
+    regressions = []
+    for key, stats in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        now, before = stats["min_ms"], base["min_ms"]
+        if now > before * (1 + tolerance) and now - before > min_delta_ms:
+            regressions.append((key, before, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the AQP Studio image pipeline")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per stage (median is reported)")
+    parser.add_argument("--photos", type=int, default=2, help="Number of synthetic 4K JPEG photos")
+    parser.add_argument("--samples", default=SAMPLE_DIR, help="Folder with .bmp4/.bmp1 samples")
+    parser.add_argument("--save", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="JSON file from an earlier --save to compare against (default: benchmarks/baseline.json)")
+    parser.add_argument("--no-baseline", action="store_true", help="Only print timings, skip the baseline comparison")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=1.0, help="Ignore slowdowns smaller than this many ms")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.photos, args.samples)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": Image.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    for key, stats in sorted(results.items()):
+        print(f"{key:60} {stats['median_ms']:10.2f} ms")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if not args.no_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        meta = baseline.get("meta", {})
+        print(f"Baseline from {meta.get('platform', 'unknown platform')}, {meta.get('cpus', '?')} CPUs")
+        baseline = baseline["results"]
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        for key, before, now in regressions:
+            print(f"REGRESSION {key}: {before:.2f} ms -> {now:.2f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Compare the old per-pixel remap loop with aqp_palette.nearest_indices
+# Usage: python benchmarks/bench_remap.py [sample_dir]
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import aqp_formats
+import aqp_palette
+
+
+def load_sample(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.lower().endswith(".bmp4"):
+        idx, palette = aqp_formats.decode_bmp4(data)
+    else:
+        idx, palette = aqp_formats.decode_bmp1(data)
+    return aqp_palette.indices_to_image(idx, palette), palette
+
+
+def loop_remap(arr, palette):
+    # The original AQPStudio.remap_to_palette inner loop
+    pal_arr = np.array(palette)
+    arr_flat = arr.reshape(-1, 3)
+
+    def closest_color(pixel):
+        diffs = pal_arr - pixel
+        dist = np.sum(diffs * diffs, axis=1)
+        return np.argmin(dist)
+    return np.array([closest_color(px) for px in arr_flat], dtype=np.uint8).reshape(arr.shape[:2])
+
+
+def main():
+    sample_dir = sys.argv[1] if len(sys.argv) > 1 else "sample_images"
+    paths = sorted(p for p in glob.glob(os.path.join(sample_dir, "*")) if os.path.splitext(p)[1].lower() in (".bmp4", ".bmp1"))
+    total_old = total_new = 0.0
+    print(f"{'file':40} {'loop ms':>10} {'batched ms':>10} {'speedup':>8}")
+    for path in paths:
+        img, palette = load_sample(path)
+        # Smooth upscale so the remap sees a realistic number of distinct colors
+        arr = np.asarray(img.convert("RGB").resize((320, 200), Image.BICUBIC))
+        # Reverse the palette so the remap has to do real work
+        palette = palette[::-1]
+        t0 = time.perf_counter()
+        old = loop_remap(arr, palette)
+        t1 = time.perf_counter()
+        new = aqp_palette.nearest_indices(arr, palette)
+        t2 = time.perf_counter()
+        if not np.array_equal(old, new):
+            raise SystemExit(f"Mismatch on {path}")
+        total_old += t1 - t0
+        total_new += t2 - t1
+        print(f"{os.path.basename(path):40} {(t1-t0)*1000:10.1f} {(t2-t1)*1000:10.2f} {(t1-t0)/(t2-t1):7.0f}x")
+    if paths:
+        print(f"{'total':40} {total_old*1000:10.1f} {total_new*1000:10.2f} {total_old/total_new:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
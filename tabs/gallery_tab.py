@@ -0,0 +1,101 @@
+import os
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+from PIL import Image, ImageTk
+
+import aqp_thumbs
+
+GALLERY_COLUMNS = 5
+GALLERY_POLL_MS = 30
+
+
+class GalleryTab(ttk.Frame):
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.thumbs = aqp_thumbs.ThumbnailCache()
+        self.directory = None
+        self.tiles = {}  # path -> Label
+        self.photos = {}  # path -> PhotoImage, kept alive for Tk
+        self.pending = set()  # paths still waiting for a thumbnail
+        self._generation = None
+        self._polling = False
+        w, h = aqp_thumbs.THUMB_SIZE
+        self.placeholder = ImageTk.PhotoImage(Image.new("RGB", (w, h), (176, 176, 176)))
+
+        top_frame = tk.Frame(self, bg="#D0D0D0")
+        top_frame.pack(fill=tk.X, padx=20, pady=(10, 4))
+        tk.Button(top_frame, bg="#D0D0D0", text="Open Folder...", command=self.choose_folder).pack(side=tk.LEFT)
+        tk.Button(top_frame, bg="#D0D0D0", text="Refresh", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        self.folder_label = tk.Label(top_frame, bg="#D0D0D0", text="No folder open", anchor="w")
+        self.folder_label.pack(side=tk.LEFT, padx=10, fill=tk.X, expand=True)
+
+        grid_frame = tk.Frame(self, bg="#D0D0D0")
+        grid_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(4, 10))
+        self.canvas = tk.Canvas(grid_frame, bg="#D0D0D0", highlightthickness=0)
+        scrollbar = tk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.grid_inner = tk.Frame(self.canvas, bg="#D0D0D0")
+        self.canvas.create_window((0, 0), window=self.grid_inner, anchor="nw")
+        self.grid_inner.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        # X11 reports the wheel as buttons 4 (up) and 5 (down) instead
+        self.canvas.bind_all("<Button-4>", lambda e: self.scroll(-1))
+        self.canvas.bind_all("<Button-5>", lambda e: self.scroll(1))
+
+    def on_mousewheel(self, event):
+        self.scroll(int(-event.delta / 120) or (-1 if event.delta > 0 else 1))
+
+    def scroll(self, units):
+        if self.winfo_ismapped():
+            self.canvas.yview_scroll(units, "units")
+
+    def choose_folder(self):
+        directory = filedialog.askdirectory(title="Folder of images")
+        if directory:
+            self.open_folder(directory)
+
+    def refresh(self):
+        if self.directory:
+            self.open_folder(self.directory)
+
+    def open_folder(self, directory):
+        self.directory = directory
+        for tile in self.tiles.values():
+            tile.destroy()
+        self.tiles.clear()
+        self.photos.clear()
+        paths = aqp_thumbs.list_images(directory)
+        self.pending = set(paths)
+        self.folder_label.config(text=f"{directory}  ({len(paths)} images)")
+        for i, path in enumerate(paths):
+            tile = tk.Label(self.grid_inner, bg="#D0D0D0", image=self.placeholder, text=os.path.basename(path),
+                            compound="top", font=("Arial", 8), width=aqp_thumbs.THUMB_SIZE[0] + 8, wraplength=aqp_thumbs.THUMB_SIZE[0])
+            tile.grid(row=i // GALLERY_COLUMNS, column=i % GALLERY_COLUMNS, padx=4, pady=4, sticky="n")
+            tile.bind("<Double-Button-1>", lambda e, p=path: self.app.open_image_file(p))
+            self.tiles[path] = tile
+        self.canvas.yview_moveto(0)
+        self._generation = self.thumbs.request(paths)
+        if not self._polling:
+            self._polling = True
+            self.after(GALLERY_POLL_MS, self.poll_thumbs)
+
+    def poll_thumbs(self):
+        while not self.thumbs.results.empty():
+            generation, path, img, error = self.thumbs.results.get()
+            tile = self.tiles.get(path)
+            if generation != self._generation or tile is None:
+                continue
+            self.pending.discard(path)
+            if error:
+                tile.config(image="", text=f"{os.path.basename(path)}\n(unreadable)")
+                continue
+            self.photos[path] = ImageTk.PhotoImage(img)
+            tile.config(image=self.photos[path])
+        if self.pending and not self.thumbs.is_stale(self._generation):
+            self.after(GALLERY_POLL_MS, self.poll_thumbs)
+        else:
+            self._polling = False
@@ -0,0 +1,143 @@
+import os
+import tkinter as tk
+import traceback
+from tkinter import filedialog, messagebox, ttk
+
+from PIL import Image, ImageTk
+
+import aqp_bloxel
+import aqp_pipeline
+import aqp_text
+
+TEXT_VIEW_SIZE = (640, 400)
+
+
+class TextTab(ttk.Frame):
+    # Text Screen Tool: convert an image to bloxels, paint over it and save an SCR.
+    # Left button paints the fg color, right button the bg color.
+    def __init__(self, parent, app):
+        super().__init__(parent)
+        self.app = app
+        self.glyphs = aqp_text.load_charset()
+        self.source = None  # Last imported image, re-converted when the mode changes
+        self.photo = None
+        self._redraw_after = None
+        self.mode_var = tk.StringVar(value="2x3")
+        self.columns_var = tk.IntVar(value=40)
+        self.fg_var = tk.IntVar(value=7)
+        self.bg_var = tk.IntVar(value=0)
+        self.screen = None
+
+        top_frame = tk.Frame(self, bg="#D0D0D0")
+        top_frame.pack(fill=tk.X, padx=20, pady=(10, 4))
+        tk.Button(top_frame, bg="#D0D0D0", text="Import Image...", command=self.import_image).pack(side=tk.LEFT)
+        tk.Button(top_frame, bg="#D0D0D0", text="Open SCR...", command=self.open_scr).pack(side=tk.LEFT, padx=5)
+        tk.Button(top_frame, bg="#D0D0D0", text="Save SCR...", command=self.save_scr).pack(side=tk.LEFT)
+        tk.Button(top_frame, bg="#D0D0D0", text="Clear", command=self.clear).pack(side=tk.LEFT, padx=5)
+        mode_frame = tk.LabelFrame(top_frame, bg="#D0D0D0", text="Bloxels")
+        mode_frame.pack(side=tk.LEFT, padx=10)
+        for mode in aqp_bloxel.BLOXEL_MODES:
+            tk.Radiobutton(mode_frame, bg="#D0D0D0", text=mode, variable=self.mode_var, value=mode, command=self.reset_screen).pack(side=tk.LEFT)
+        columns_frame = tk.LabelFrame(top_frame, bg="#D0D0D0", text="Columns")
+        columns_frame.pack(side=tk.LEFT)
+        for columns in aqp_text.TEXT_COLUMNS:
+            tk.Radiobutton(columns_frame, bg="#D0D0D0", text=str(columns), variable=self.columns_var, value=columns, command=self.reset_screen).pack(side=tk.LEFT)
+
+        body_frame = tk.Frame(self, bg="#D0D0D0")
+        body_frame.pack(padx=20, pady=(4, 10))
+        w, h = TEXT_VIEW_SIZE
+        self.canvas = tk.Canvas(body_frame, width=w, height=h, bg="#000000", highlightthickness=0, cursor="crosshair")
+        self.canvas.pack(side=tk.LEFT)
+        self.canvas_image = self.canvas.create_image(0, 0, anchor="nw")
+        for button, var in (("1", self.fg_var), ("3", self.bg_var)):
+            self.canvas.bind(f"<Button-{button}>", lambda e, v=var: self.paint_at(e, v.get()))
+            self.canvas.bind(f"<B{button}-Motion>", lambda e, v=var: self.paint_at(e, v.get()))
+
+        colors_frame = tk.LabelFrame(body_frame, bg="#D0D0D0", text="Colors")
+        colors_frame.pack(side=tk.LEFT, padx=(10, 0), fill=tk.Y)
+        tk.Label(colors_frame, bg="#D0D0D0", text="FG").grid(row=0, column=0)
+        tk.Label(colors_frame, bg="#D0D0D0", text="BG").grid(row=0, column=1)
+        for i, (r, g, b) in enumerate(aqp_text.DEFAULT_PALETTE):
+            color = f"#{r:02X}{g:02X}{b:02X}"
+            for column, var in ((0, self.fg_var), (1, self.bg_var)):
+                tk.Radiobutton(colors_frame, indicatoron=False, width=3, bg=color, selectcolor=color, activebackground=color,
+                               variable=var, value=i).grid(row=i + 1, column=column, padx=2, pady=1)
+        self.status_label = tk.Label(self, bg="#D0D0D0", text="", anchor="w")
+        self.status_label.pack(fill=tk.X, padx=20)
+        self.reset_screen()
+
+    def reset_screen(self):
+        # New empty screen for the current mode and width, re-converting any imported image
+        self.screen = aqp_bloxel.BloxelScreen(self.glyphs, self.mode_var.get(), self.columns_var.get())
+        if self.source is not None:
+            self.screen.load_image(self.source, sampling=self.app.sampling_var.get(), metric=self.app.metric_var.get())
+        self.redraw()
+
+    def clear(self):
+        self.screen.clear(self.bg_var.get())
+        self.redraw()
+
+    def paint_at(self, event, color):
+        w, h = TEXT_VIEW_SIZE
+        grid_w, grid_h = self.screen.size
+        if self.screen.paint(event.x * grid_w // w, event.y * grid_h // h, color):
+            self.schedule_redraw()
+
+    def schedule_redraw(self):
+        # Coalesce a drag's motion events into one encode + redraw per idle pass
+        if self._redraw_after is None:
+            self._redraw_after = self.after_idle(self.redraw)
+
+    def redraw(self):
+        self._redraw_after = None
+        updated = self.screen.encode()
+        img = self.screen.render().convert("RGB").resize(TEXT_VIEW_SIZE, Image.NEAREST)
+        self.photo = ImageTk.PhotoImage(img)
+        self.canvas.itemconfig(self.canvas_image, image=self.photo)
+        grid_w, grid_h = self.screen.size
+        self.status_label.config(text=f"{self.screen.columns} columns, {self.screen.mode} bloxels ({grid_w}x{grid_h}), {updated} cells re-encoded")
+
+    def import_image(self):
+        file_path = filedialog.askopenfilename(filetypes=[
+            ("Image Files", "*.png;*.jpg;*.jpeg;*.bmp;*.bmp4;*.bm4;*.bmp1;*.bm1;*.gif;*.tiff;*.tif;*.webp;*.ico;*.scr;*.scrn")
+        ])
+        if not file_path:
+            return
+        try:
+            img, _ = aqp_pipeline.load_image(file_path)
+            self.source = img.convert("RGB")
+            self.reset_screen()
+        except Exception as e:
+            self.show_error("Failed to load image", e)
+
+    def open_scr(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Aquarius+ Text Screens", "*.scr;*.scrn")])
+        if not file_path:
+            return
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            self.source = None
+            self.columns_var.set(aqp_text.screen_columns(data))
+            self.reset_screen()
+            self.screen.load_scr(data)
+            self.redraw()
+        except Exception as e:
+            self.show_error("Failed to load SCR", e)
+
+    def save_scr(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".scr", filetypes=[("Aquarius+ Text Screen", "*.scr;*.scrn")])
+        if not file_path:
+            return
+        try:
+            with open(file_path, "wb") as f:
+                f.write(self.screen.to_scr())
+            self.status_label.config(text=f"Saved {os.path.basename(file_path)}")
+        except Exception as e:
+            self.show_error("Failed to save SCR", e)
+
+    def show_error(self, message, e):
+        tb = traceback.format_exc()
+        with open("error_log.txt", "w") as f:
+            f.write(f"{message}: {e}\n\n{tb}")
+        messagebox.showerror("Error", f"{message}: {e}\nSee error_log.txt for details.")
@@ -0,0 +1,55 @@
+import numpy as np
+
+import aqp_dither
+
+
+def reference_serpentine(rgb, palette):
+    # Plain serpentine Floyd-Steinberg with an exact nearest-color search
+    h, w, _ = rgb.shape
+    work = np.zeros((h + 1, w, 3))
+    work[:h] = rgb
+    pal = np.asarray(palette, dtype=np.float64)
+    out = np.zeros((h, w), dtype=np.uint8)
+    for y in range(h):
+        step = 1 if y % 2 == 0 else -1
+        for x in (range(w) if step == 1 else range(w - 1, -1, -1)):
+            val = np.clip(work[y, x], 0, 255)
+            i = int(np.argmin(((pal - val) ** 2).sum(axis=1)))
+            out[y, x] = i
+            err = val - pal[i]
+            if 0 <= x + step < w:
+                work[y, x + step] += err * 7 / 16
+                work[y + 1, x + step] += err * 1 / 16
+            if 0 <= x - step < w:
+                work[y + 1, x - step] += err * 3 / 16
+            work[y + 1, x] += err * 5 / 16
+    return out
+
+
+def random_palette(seed):
+    levels = np.random.default_rng(seed).integers(0, 16, (16, 3))
+    return [tuple(int(v) * 17 for v in c) for c in levels]
+
+
+def test_candidate_lut_holds_the_nearest_color():
+    palette = random_palette(0)
+    lut, groups = aqp_dither.candidate_lut(palette)
+    points = np.random.default_rng(1).random((5000, 3)) * 255
+    nearest = np.argmin(((points[:, None, :] - np.asarray(palette)[None]) ** 2).sum(axis=2), axis=1)
+    keys = (np.floor(points * 63 / 255 + 0.5).astype(int) * [1 << 12, 1 << 6, 1]).sum(axis=1)
+    for key, best in zip(keys, nearest):
+        entry = lut[key]
+        assert entry == best if entry >= 0 else best in groups[-1 - entry]
+
+
+def test_serpentine_matches_exact_reference():
+    palette = random_palette(2)
+    rgb = (np.random.default_rng(3).random((24, 40, 3)) * 255).astype(np.uint8)
+    out = aqp_dither.dither(rgb, palette, "floyd-serpentine")
+    assert np.array_equal(out, reference_serpentine(rgb, palette))
+
+
+def test_export_only_methods_have_a_live_stand_in():
+    for method, stand_in in aqp_dither.EXPORT_ONLY_METHODS.items():
+        assert method in aqp_dither.DITHER_METHODS
+        assert stand_in in aqp_dither.DITHER_METHODS and stand_in not in aqp_dither.EXPORT_ONLY_METHODS
@@ -0,0 +1,123 @@
+import struct
+
+import numpy as np
+import pytest
+
+import aqp_framebank
+from aqp_framebank import FRAME_BYTES, FRAME_DELTA, FRAME_KEY
+
+PALETTE = bytes(range(32))
+HEADER_BYTES = 10 + len(PALETTE)
+
+
+def make_frames(count, export_fmt="BMP4", seed=0):
+    # Random first frame, then each frame changes a few bytes of the last
+    rng = np.random.default_rng(seed)
+    body = rng.integers(0, 256, FRAME_BYTES[export_fmt], dtype=np.uint8)
+    frames = []
+    for _ in range(count):
+        frames.append(body.tobytes() + PALETTE)
+        body = body.copy()
+        body[rng.integers(0, len(body), 20)] ^= 0xFF
+    return frames
+
+
+def frame_records(bank):
+    # (type, spans) per frame, spans as (skip, length); keyframes have no spans
+    size = struct.unpack_from("<H", bank, 8)[0]
+    pos = HEADER_BYTES
+    records = []
+    while pos < len(bank):
+        kind = bank[pos]
+        pos += 1
+        if kind == FRAME_KEY:
+            records.append((kind, None))
+            pos += size
+            continue
+        (count,) = struct.unpack_from("<H", bank, pos)
+        pos += 2
+        spans = []
+        for _ in range(count):
+            skip, length = struct.unpack_from("<HB", bank, pos)
+            spans.append((skip, length))
+            pos += 3 + length
+        records.append((kind, spans))
+    return records
+
+
+def test_single_frame_is_a_keyframe():
+    frames = make_frames(1)
+    bank = aqp_framebank.encode_bank(frames)
+    assert bank[:4] == aqp_framebank.MAGIC
+    assert [kind for kind, _ in frame_records(bank)] == [FRAME_KEY]
+    assert len(bank) == HEADER_BYTES + 1 + FRAME_BYTES["BMP4"]
+    assert aqp_framebank.verify_bank(bank, frames)
+
+
+def test_delta_frames_round_trip():
+    frames = make_frames(6)
+    bank = aqp_framebank.encode_bank(frames)
+    assert [kind for kind, _ in frame_records(bank)] == [FRAME_KEY] + [FRAME_DELTA] * 5
+    assert len(bank) < 2 * FRAME_BYTES["BMP4"]
+    export_fmt, palette, _ = aqp_framebank.decode_bank(bank)
+    assert (export_fmt, palette) == ("BMP4", PALETTE)
+    assert aqp_framebank.bank_files(bank) == frames
+
+
+def test_keyframe_interval():
+    frames = make_frames(7)
+    bank = aqp_framebank.encode_bank(frames, keyframe_interval=3)
+    kinds = [kind for kind, _ in frame_records(bank)]
+    assert kinds == [FRAME_KEY, FRAME_DELTA, FRAME_DELTA, FRAME_KEY, FRAME_DELTA, FRAME_DELTA, FRAME_KEY]
+    assert aqp_framebank.verify_bank(bank, frames)
+
+
+def test_identical_frames_give_empty_deltas():
+    frames = make_frames(1) * 3
+    bank = aqp_framebank.encode_bank(frames)
+    assert frame_records(bank)[1:] == [(FRAME_DELTA, []), (FRAME_DELTA, [])]
+    assert aqp_framebank.verify_bank(bank, frames)
+
+
+def test_long_changes_split_at_max_span():
+    size = FRAME_BYTES["BMP4"]
+    prev = bytes(size)
+    cur = bytes(100) + b"\x01" * 600 + bytes(size - 700)
+    spans = aqp_framebank.diff_spans(prev, cur)
+    assert spans == [(100, 355), (355, 610), (610, 700)]
+    frames = [prev + PALETTE, cur + PALETTE]
+    bank = aqp_framebank.encode_bank(frames)
+    assert frame_records(bank)[1] == (FRAME_DELTA, [(100, 255), (0, 255), (0, 90)])
+    assert aqp_framebank.verify_bank(bank, frames)
+
+
+def test_short_gaps_are_merged():
+    prev = bytes(100)
+    cur = bytearray(prev)
+    cur[10] = cur[12] = 1  # gap of 1: merged
+    cur[20] = cur[30] = 1  # gap of 9: separate spans
+    assert aqp_framebank.diff_spans(prev, bytes(cur)) == [(10, 13), (20, 21), (30, 31)]
+    assert aqp_framebank.diff_spans(prev, bytes(cur), merge_gap=10) == [(10, 31)]
+    assert aqp_framebank.diff_spans(prev, prev) == []
+
+
+def test_bmp1_frames():
+    frames = make_frames(4, "BMP1")
+    bank = aqp_framebank.encode_bank(frames, "BMP1")
+    assert struct.unpack_from("<BBHH", bank, 4) == (aqp_framebank.VERSION, 1, 4, FRAME_BYTES["BMP1"])
+    assert [kind for kind, _ in frame_records(bank)] == [FRAME_KEY] + [FRAME_DELTA] * 3
+    export_fmt, _, _ = aqp_framebank.decode_bank(bank)
+    assert export_fmt == "BMP1"
+    assert aqp_framebank.bank_files(bank) == frames
+
+
+def test_mismatched_palette_is_rejected():
+    frames = make_frames(3)
+    frames[2] = frames[2][:-1] + b"\xff"
+    with pytest.raises(ValueError, match="Frame 2"):
+        aqp_framebank.encode_bank(frames)
+
+
+def test_no_frames_is_rejected():
+    with pytest.raises(ValueError):
+        aqp_framebank.encode_bank([])
@@ -0,0 +1,50 @@
+import numpy as np
+from PIL import Image
+
+import aqp_cli
+import aqp_dither
+import aqp_palette
+import aqp_pipeline
+
+
+def test_cli_convert_matches_gui_proxy_path(tmp_path):
+    # A photo big enough to be draft-decoded: the CLI must use the same proxy
+    y, x = np.mgrid[0:1800, 0:2880]
+    rgb = np.stack([x * 255 // 2880, y * 255 // 1800, (x + y) % 256], axis=2).astype(np.uint8)
+    path = tmp_path / "photo.jpg"
+    Image.fromarray(rgb).save(path, quality=90)
+    proxy = aqp_pipeline.WorkingImage.open(str(path)).proxy
+    assert proxy.size == (1440, 900)
+    settings = {"scaling": "stretch", "sampling": "bicubic", "dither": "floyd", "cells": "common", "metric": "rgb", "quantizer": "median"}
+    for export_fmt in ["BMP4", "BMP1"]:
+        out_path = tmp_path / f"out.{export_fmt}"
+        options = dict(settings, export_fmt=export_fmt, compress=None, palette=None, source_palette=False)
+        aqp_cli.convert_file(str(path), str(out_path), options)
+        img, palette = aqp_pipeline.process_image(proxy, export_fmt=export_fmt, palette=None, **settings)
+        assert out_path.read_bytes() == aqp_pipeline.encode_image(img, palette, export_fmt)
+
+
+def gradient(width=320, height=200):
+    y, x = np.mgrid[0:height, 0:width]
+    return Image.fromarray(np.stack([x * 255 // width, y * 255 // height, (x * y) % 256], axis=2).astype(np.uint8))
+
+
+def test_quantize_dithers_against_the_snapped_palette():
+    img = gradient()
+    out, palette = aqp_pipeline.quantize_image(img, "floyd")
+    assert palette == aqp_palette.snap_palette(palette)
+    expected = aqp_dither.dither(np.asarray(img), palette, "floyd")
+    assert np.array_equal(np.asarray(out), expected)
+
+
+def test_quantize_keeps_own_colors_when_not_adaptive():
+    colors = [(3, 5, 250), (200, 20, 20), (10, 240, 10), (128, 128, 128), (255, 255, 255)]
+    rgb = np.array(colors, dtype=np.uint8)[np.arange(40 * 25) % len(colors)].reshape(25, 40, 3)
+    img = Image.fromarray(rgb)
+    out, palette = aqp_pipeline.quantize_image(img, "floyd", adaptive=False)
+    own = [color for _, color in img.getcolors(16)]
+    assert palette[:len(own)] == aqp_palette.snap_palette(own)
+    # Every pixel lands on its own (snapped) color
+    snapped = np.asarray(aqp_palette.snap_palette(colors))
+    shown = np.asarray(palette)[np.asarray(out)]
+    assert np.array_equal(shown, snapped[np.arange(40 * 25) % len(colors)].reshape(25, 40, 3))
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import aqp_quantize
+
+
+@pytest.mark.parametrize("name, mode, kwargs", [
+    ("rgb.bmp", "RGB", {}),
+    ("rgb.tga", "RGB", {}),
+    ("rgb.tif", "RGB", {}),
+    ("rgb.ppm", "RGB", {}),
+    ("gray.bmp", "L", {}),
+    ("indexed.bmp", "P", {}),
+    ("lzw.tif", "RGB", {"compression": "tiff_lzw"}),
+    ("rgb.png", "RGB", {}),
+])
+def test_file_histogram_matches_full_decode(tmp_path, name, mode, kwargs):
+    rgb = (np.random.default_rng(0).random((301, 517, 3)) * 255).astype(np.uint8)
+    img = Image.fromarray(rgb)
+    img = img.quantize(200) if mode == "P" else img.convert(mode)
+    path = tmp_path / name
+    img.save(path, **kwargs)
+    expected = aqp_quantize.image_histogram(Image.open(path).convert("RGB"))
+    # max_pixels=0 takes the large-file path for every format
+    assert np.array_equal(aqp_quantize.file_histogram(path, max_pixels=0), expected)
+    assert expected.sum() == 301 * 517
+
+
+def test_raw_bands_only_for_uncompressed(tmp_path):
+    img = Image.new("RGB", (40, 30), (10, 20, 30))
+    img.save(tmp_path / "a.bmp")
+    img.save(tmp_path / "a.png")
+    bands = aqp_quantize.raw_bands(Image.open(tmp_path / "a.bmp"), band_rows=8)
+    assert [band.size for band in bands] == [(40, 8)] * 3 + [(40, 6)]
+    assert aqp_quantize.raw_bands(Image.open(tmp_path / "a.png")) is None
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+import aqp_resources
+import aqp_text
+
+
+def test_resource_path_prefers_pyinstaller_bundle(monkeypatch):
+    assert os.path.isfile(aqp_text.DEFAULT_CHARSET)
+    monkeypatch.setattr(sys, "_MEIPASS", "bundle", raising=False)
+    assert aqp_resources.resource_path("assets/aquascii.bin") == os.path.join("bundle", "assets/aquascii.bin")
+
+
+def test_decode_scr_matches_render_scr():
+    glyphs = aqp_text.load_charset()
+    rgb = (np.random.default_rng(0).random((200, 320, 3)) * 255).astype(np.uint8)
+    scr = aqp_text.image_to_scr(Image.fromarray(rgb), glyphs)
+    indices, palette = aqp_text.decode_scr(scr)
+    assert indices.shape == (200, 320)
+    assert palette == aqp_text.DEFAULT_PALETTE
+    rendered = aqp_text.render_scr(scr, glyphs)
+    assert np.array_equal(np.asarray(rendered), indices)
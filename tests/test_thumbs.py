@@ -0,0 +1,30 @@
+from PIL import Image
+
+import aqp_thumbs
+
+
+def make_images(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"img{i}.png"
+        Image.new("RGB", (64, 40), (i * 40, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_memory_cache_is_bounded_lru(tmp_path):
+    paths = make_images(tmp_path, 4)
+    cache = aqp_thumbs.ThumbnailCache(cache_dir=str(tmp_path / "cache"), max_entries=2)
+    try:
+        first = cache.load(paths[0])
+        cache.load(paths[1])
+        assert cache.load(paths[0]) is first  # Touch 0, so 1 is the oldest
+        cache.load(paths[2])
+        assert len(cache._memory) == 2
+        assert cache.cache_path(paths[1]) not in cache._memory
+        assert cache.cache_path(paths[0]) in cache._memory
+        # Dropped entries come back from the disk cache
+        assert cache.load(paths[1]).size == first.size
+        assert len(cache._memory) == 2
+    finally:
+        cache.close()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import aqp_tiles
+import aqp_vram
+
+
+def sprite_sheet():
+    # Two 16x16 frames side by side, transparent except for:
+    #   frame 0: a red 8x8 part top left and an opaque black part bottom right
+    #   frame 1: the same red part top right
+    rgba = np.zeros((16, 32, 4), dtype=np.uint8)
+    rgba[0:8, 0:8] = (255, 0, 0, 255)
+    rgba[8:16, 8:16] = (0, 0, 0, 255)
+    rgba[0:8, 24:32] = (255, 0, 0, 255)
+    return Image.fromarray(rgba, "RGBA")
+
+
+def test_sprite_indices_keep_index_0_for_transparency():
+    indices, palette = aqp_vram.sprite_indices(sprite_sheet(), dither="none")
+    assert len(palette) == 16
+    assert (indices[0:8, 8:24] == 0).all()
+    assert (indices[0:8, 0:8] > 0).all() and (indices[8:16, 8:16] > 0).all()
+    assert palette[indices[0, 0]] == (255, 0, 0)
+    assert palette[indices[8, 8]] == (0, 0, 0)
+
+
+def test_sprite_indices_with_forced_palette():
+    forced = [(255, 0, 255), (0, 0, 0), (255, 0, 0)] + [(255, 255, 255)] * 13
+    indices, palette = aqp_vram.sprite_indices(sprite_sheet(), forced, dither="floyd")
+    assert palette == forced
+    assert set(np.unique(indices).tolist()) == {0, 1, 2}
+    assert (indices[0:8, 0:8] == 2).all() and (indices[8:16, 8:16] == 1).all()
+
+
+def test_sprite_asset_parts_and_slots():
+    indices, palette = aqp_vram.sprite_indices(sprite_sheet(), dither="none")
+    asset = aqp_vram.sprite_asset("sheet", indices, palette, (16, 16), instances=3)
+    # Frame 0 uses 2 parts, frame 1 one; the red part is shared
+    assert (asset.numbers >= 0).sum(axis=1).tolist() == [2, 1]
+    assert len(asset.tiles) == 2
+    assert asset.slots == 2 * 3
+
+
+def tilemap(width, height, seed=0):
+    # Random 2-color 8x8 tiles, so (almost) every tile is unique
+    indices = np.random.default_rng(seed).integers(0, 2, (height, width)).astype(np.uint8)
+    return aqp_vram.tilemap_asset("map", indices, [(0, 0, 0), (255, 255, 255)] + [(0, 0, 0)] * 14)
+
+
+def test_plan_rejects_a_second_tilemap():
+    with pytest.raises(ValueError, match="one tilemap"):
+        aqp_vram.plan_vram([tilemap(16, 16), tilemap(16, 16, seed=1)])
+
+
+def test_plan_reports_tilemap_size():
+    plan = aqp_vram.plan_vram([tilemap(80, 24)])
+    regions = {region: (used, capacity) for region, used, capacity, _ in aqp_vram.plan_regions(plan)}
+    assert regions["tilemap"] == (aqp_tiles.MAP_BYTES, aqp_tiles.MAP_BYTES)
+    assert regions["tilemap columns"] == (10, 64) and regions["tilemap rows"] == (3, 32)
+    assert aqp_vram.plan_fits(plan)
+    assert len(aqp_vram.vram_image(plan)) == aqp_vram.VRAM_BYTES
+
+
+def test_plan_over_map_size_does_not_fit():
+    plan = aqp_vram.plan_vram([tilemap(8 * 65, 8)])
+    assert not aqp_vram.plan_fits(plan)
+    lines = aqp_vram.plan_report(plan).splitlines()
+    assert any(line.startswith("tilemap columns") and line.endswith("OVER") for line in lines)
+    with pytest.raises(ValueError, match="does not fit"):
+        aqp_vram.vram_image(plan)